@@ -418,7 +418,7 @@ class CompilerIDE(QMainWindow):
 
             # --- 2. 语法分析 ---
             from syntax_analyzer import SyntaxAnalyzer
-            sa = SyntaxAnalyzer()
+            sa = SyntaxAnalyzer(trace=True)
             sa.parse()
 
             # --- 3. 显示语法树 ---
@@ -585,7 +585,7 @@ class CompilerIDE(QMainWindow):
             from syntax_analyzer import SyntaxAnalyzer
             sa = SyntaxAnalyzer()
 
-            sa.parse()  # 内部会写出 syntaxTree.txt, syntax_errors.txt, symbol_table.json, quads.txt
+            sa.parse()  # 内部会写出 syntax_errors.txt, symbol_table.json, quads.txt（未开启 trace，不刷新 syntaxTree.txt）
 
             # 3. 读取并显示四元式
             quads_path = "./output/quads.txt"
@@ -1,5 +1,4 @@
 import json
-from collections import defaultdict
 
 
 def process_quads(file_path='./output/quads.txt'):
@@ -39,6 +38,9 @@ def process_quads(file_path='./output/quads.txt'):
 
 
 class TargetCodeGenerator:
+    __slots__ = ('data_segment', 'temp_vars', 'output', 'functions', 'variables',
+                 'current_function', 'label_targets', '_val_cache', 'temp_regs')
+
     def __init__(self, symtab_path='./output/symbol_table.json'):
         self.data_segment = set()
         self.temp_vars = set()
@@ -49,16 +51,14 @@ class TargetCodeGenerator:
         self.variables = set()
         self._load_symbol_table(symtab_path)
 
-        # 新增：从四元式收集的参数列表
-        self.func_params = defaultdict(list)
-        self.pending_call = None
-        self.pending_count = 0
-
         self.current_function = None
 
-        self.last_label = None
-
-        self.pending_res = None
+        # 所有跳转指令引用到的标号，只有这些标号需要输出
+        self.label_targets = set()
+        # 操作数 -> 汇编寻址形式，生成前一次性分类好
+        self._val_cache = {}
+        # 分配到寄存器中的临时变量 TN -> 寄存器名
+        self.temp_regs = {}
 
     def _load_symbol_table(self, path):
         with open(path, 'r', encoding='utf-8') as f:
@@ -87,8 +87,10 @@ class TargetCodeGenerator:
             "    _msg_p db 0ah, 'Output:', 0",
             "    _msg_s db 0ah, 'Input:', 0"
         ])
-        for var in sorted(self.data_segment | self.temp_vars):
-            self.output.append(f'    _{var} dw 0')
+        # 所有变量声明拼成一整块追加，写文件时也是一次连续写出
+        all_vars = self.data_segment | self.temp_vars
+        if all_vars:
+            self.output.append('\n'.join([f'    _{var} dw 0' for var in sorted(all_vars)]))
         self.output.append('data ends\n')
 
     def add_init_code(self):
@@ -112,8 +114,8 @@ class TargetCodeGenerator:
 
         if op == 'label':
             # 先输出 L<line>:
-            self.last_label = res
-            self.output.append(f'L{res}:')
+            if res in self.label_targets:
+                self.output.append(f'L{res}:')
             return
 
         # 1) 如果是函数定义四元式 (op 为函数名, arg1/arg2/res 都是 '_')
@@ -123,13 +125,6 @@ class TargetCodeGenerator:
             self.output.append(f'F_{op}:')  # 再输出F_标签
             self.output.append('    push bp')
             self.output.append('    mov bp, sp')
-            # 恢复从前面 para 收集到的参数
-            params = self.func_params.get(op, [])
-            for idx, pname in enumerate(params):
-                offset = 4 + (len(params) - idx - 1) * 2
-                self.data_segment.add(pname)
-                self.output.append(f'    mov ax, ss:[bp+{offset}]')
-                self.output.append(f'    mov ds:[_{pname}], ax')
             return
 
         # 2) 收集并生成 para/push
@@ -140,8 +135,10 @@ class TargetCodeGenerator:
 
         if op == 'call' and arg1 not in ('read', 'write'):
             self.output.append(f'    call F_{arg1}')
-            self.data_segment.add(res)
-            self.output.append(f'    mov word ptr ds:[_{res}], ax')
+            # 分配到寄存器的返回值不需要数据段中的存储单元
+            if res not in self.temp_regs:
+                self.data_segment.add(res)
+            self.output.append(f'    mov {self._val(res)}, ax')
             if arg2.isdigit() and int(arg2) > 0:
                 self.output.append(f'    add sp, {int(arg2) * 2}')
             return
@@ -156,6 +153,19 @@ class TargetCodeGenerator:
         # 四则运算
         if op in ['+', '-', '*', '/']:
             self.temp_vars.add(res)
+            # 两个操作数都是立即数时直接折叠成常量，不经过 AX
+            if arg1.isdigit() and arg2.isdigit() and not (op == '/' and int(arg2) == 0):
+                a, b = int(arg1), int(arg2)
+                if op == '+':
+                    v = a + b
+                elif op == '-':
+                    v = a - b
+                elif op == '*':
+                    v = a * b
+                else:
+                    v = a // b
+                self.output.append(f'    mov {self._val(res)}, {v & 0xFFFF}')
+                return
             if op == '+':
                 if self.current_function == 'add':
                     # 在 add 函数中，直接使用栈上的参数
@@ -169,7 +179,10 @@ class TargetCodeGenerator:
                 self.output.append(f'    sub ax, {self._val(arg2)}')
             elif op == '*':
                 self.output.append(f'    mov ax, {self._val(arg1)}')
-                self.output.append('    imul word ptr ds:[_' + arg2 + ']')
+                if arg2 in self.temp_regs:
+                    self.output.append(f'    imul {self.temp_regs[arg2]}')
+                else:
+                    self.output.append('    imul word ptr ds:[_' + arg2 + ']')
             elif op == '/':
                 self.output.append(f'    mov ax, {self._val(arg1)}')
                 self.output.append('    cwd')
@@ -191,8 +204,17 @@ class TargetCodeGenerator:
         # 条件跳转
         if op in ['j<', 'j<=', 'j>', 'j>=', 'j==', 'j!=']:
             targets = {'j<': 'jl', 'j<=': 'jle', 'j>': 'jg', 'j>=': 'jge', 'j==': 'je', 'j!=': 'jne'}
-            self.output.append(f'    mov ax, {self._val(arg1)}')
-            self.output.append(f'    cmp ax, {self._val(arg2)}')
+            if not arg1.isdigit() and arg2.isdigit():
+                # 内存与立即数比较，直接 cmp word ptr ds:[_X], imm，省去 mov ax
+                self.output.append(f'    cmp {self._val(arg1)}, {arg2}')
+            elif arg1.isdigit() and not arg2.isdigit():
+                # 立即数在左侧时交换操作数，关系运算随之对调
+                swapped = {'j<': 'j>', 'j<=': 'j>=', 'j>': 'j<', 'j>=': 'j<=', 'j==': 'j==', 'j!=': 'j!='}
+                self.output.append(f'    cmp {self._val(arg2)}, {arg1}')
+                op = swapped[op]
+            else:
+                self.output.append(f'    mov ax, {self._val(arg1)}')
+                self.output.append(f'    cmp ax, {self._val(arg2)}')
             self.output.append(f'    {targets[op]} L{res}')
             return
 
@@ -225,6 +247,14 @@ class TargetCodeGenerator:
             self.output.append(f'L{res}:')
 
     def _val(self, v):
+        cached = self._val_cache.get(v)
+        if cached is None:
+            cached = self._classify(v)
+            self._val_cache[v] = cached
+        return cached
+
+    @staticmethod
+    def _classify(v):
         if isinstance(v, (int,)) or (isinstance(v, str) and v.isdigit()):
             return str(v)
         return f'word ptr ds:[_{v}]'
@@ -350,19 +380,153 @@ class TargetCodeGenerator:
         self.output.append('code ends')
         self.output.append('end start')
 
+    def _alloc_temp_regs(self, quads):
+        """
+        对临时变量做线性扫描寄存器分配。
+        只有单次定义、活跃区间内不跨越函数调用和跳转目标标号的临时变量才参与分配，
+        寄存器不足时把结束最晚的区间溢出回内存。
+        AX 作为运算累加器、DX 会被 cwd/idiv/imul 改写，因此只使用 BX/CX/SI/DI。
+        """
+        first_def = {}
+        last_use = {}
+        def_count = {}
+        eligible = {}  # 每一次定义都是会写回结果的运算时才可放进寄存器
+        barriers = []  # 会破坏寄存器内容或引入其他控制流入口的四元式位置
+        for i, (op, a1, a2, res) in enumerate(quads):
+            if op == 'call' or op in self.functions or (op == 'label' and res in self.label_targets):
+                barriers.append(i)
+            for v in (a1, a2):
+                if v in first_def:
+                    last_use[v] = i
+            if isinstance(res, str) and res.startswith('T') and res not in self.variables:
+                # 只有代码生成器真正会写回结果的运算才能把结果放进寄存器
+                writes_back = op in ('+', '-', '*', '/', 'call')
+                if res in first_def:
+                    def_count[res] += 1
+                    eligible[res] = eligible[res] and writes_back
+                    if not op.startswith('j'):
+                        last_use[res] = i
+                else:
+                    first_def[res] = i
+                    def_count[res] = 1
+                    eligible[res] = writes_back
+
+        intervals = []
+        for t, start in first_def.items():
+            end = last_use.get(t)
+            if end is None or def_count[t] != 1 or not eligible[t]:
+                continue
+            if any(start < b < end for b in barriers):
+                continue
+            intervals.append((start, end, t))
+        intervals.sort()
+
+        free = ['di', 'si', 'cx', 'bx']
+        active = []  # (end, temp)，按结束位置排序
+        for start, end, t in intervals:
+            # 只释放在当前四元式之前就已结束的区间，保证结果寄存器不与操作数冲突
+            while active and active[0][0] < start:
+                free.append(self.temp_regs[active.pop(0)[1]])
+            if free:
+                self.temp_regs[t] = free.pop()
+            else:
+                last_end, last_t = active[-1]
+                if last_end <= end:
+                    continue
+                # 溢出结束最晚的区间，把它的寄存器让给当前临时变量
+                self.temp_regs[t] = self.temp_regs.pop(last_t)
+                active.pop()
+            active.append((end, t))
+            active.sort()
+
+    @staticmethod
+    def _ret_tail(lines, start):
+        """
+        若 start 处标号之后紧跟一段返回序列（mov sp,bp / pop bp / ret 或 main 的 int 21h 退出），
+        返回这段指令；否则返回 None。
+        """
+        tail = []
+        for line in lines[start + 1:start + 8]:
+            if line.endswith(':'):
+                continue
+            if line.startswith(('    j', '    call')) or len(tail) >= 4:
+                return None
+            tail.append(line)
+            if line == '    ret' or (line == '    int 21h' and tail[-2:-1] == ['    mov ah,4ch']):
+                return tail
+        return None
+
+    def _fuse_jumps(self):
+        """
+        跳转窥孔优化：
+        1) jmp Lx 紧跟 Lx: 时直接顺序执行，删掉 jmp；
+        2) jmp Lx 且 Lx 处为返回序列时，把返回序列内联到 jmp 的位置；
+        3) jcc L1; jmp L2; L1: 反转条件为 jncc L2; L1:。
+        最后删除不再被任何跳转引用的标号。
+        """
+        inverse = {'jl': 'jge', 'jge': 'jl', 'jle': 'jg', 'jg': 'jle', 'je': 'jne', 'jne': 'je'}
+        out = self.output
+        labels = {line[:-1]: i for i, line in enumerate(out)
+                  if line.startswith('L') and line.endswith(':')}
+        fused = []
+        i, n = 0, len(out)
+        while i < n:
+            parts = out[i].split()
+            if len(parts) == 2 and parts[0] == 'jmp' and parts[1] in labels:
+                if i + 1 < n and out[i + 1] == f'{parts[1]}:':
+                    i += 1
+                    continue
+                tail = self._ret_tail(out, labels[parts[1]])
+                if tail:
+                    fused.extend(tail)
+                    i += 1
+                    continue
+            elif len(parts) == 2 and parts[0] in inverse and i + 2 < n:
+                nxt = out[i + 1].split()
+                if len(nxt) == 2 and nxt[0] == 'jmp' and out[i + 2] == f'{parts[1]}:':
+                    fused.append(f'    {inverse[parts[0]]} {nxt[1]}')
+                    i += 2
+                    continue
+            fused.append(out[i])
+            i += 1
+
+        referenced = {line.split()[1] for line in fused if line.startswith('    j')}
+        self.output = [line for line in fused
+                       if not (line[:-1] in labels and line.endswith(':') and line[:-1] not in referenced)]
+
     def generate(self, quads):
         # 先收集所有全局变量和临时变量
-        for v in self.variables:
-            self.data_segment.add(v)
+        self.data_segment.update(self.variables)
+        # 同一趟扫描中顺带收集跳转目标，生成时据此省略无人引用的标号
+        add_temp = self.temp_vars.add
+        add_target = self.label_targets.add
         for op, a1, a2, res in quads:
             if isinstance(res, str) and res.startswith('T'):
-                self.temp_vars.add(res)
+                add_temp(res)
+            elif op.startswith('j'):
+                add_target(res)
+
+        # 短生命周期的临时变量放入寄存器，无需再在数据段中分配
+        self._alloc_temp_regs(quads)
+        self.temp_vars.difference_update(self.temp_regs)
+
+        # 预先对所有操作数做一次立即数/内存分类，gen_quad 中 _val 只需查表
+        cache = self._val_cache
+        cache.update(self.temp_regs)
+        classify = self._classify
+        for quad in quads:
+            for v in quad[1:]:
+                if v not in cache:
+                    cache[v] = classify(v)
 
         # 生成代码各部分
         self.add_header()
         self.add_init_code()
+        # 热循环中预先绑定方法，避免每条四元式重复查找属性
+        gen_quad = self.gen_quad
         for quad in quads:
-            self.gen_quad(quad)
+            gen_quad(quad)
+        self._fuse_jumps()
         self.add_library()
         self.add_footer()
 
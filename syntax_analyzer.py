@@ -1,16 +1,20 @@
 # 定义 Token 类，用于封装一个词法单元的信息
 import json
-import logging
+import math
+import operator
 import os
 import sys
+from itertools import chain
 from typing import Optional, List, Dict, Tuple, Union
 
 
 class Token:
-    def __init__(self, line, col, token_type, value):
-        # 行号和列号转换为整数
-        self.line = int(line)
-        self.col = int(col)
+    __slots__ = ('line', 'col', 'type', 'value')
+
+    def __init__(self, line: int, col: int, token_type, value):
+        # 行号和列号在加载时已转换为整数
+        self.line = line
+        self.col = col
         self.type = token_type  # 词法类型，如 KEYWORD、IDENTIFIER、OPERATOR 等
         self.value = value  # 实际的字符串值，如 "int", "main", "+", "0" 等
 
@@ -19,63 +23,179 @@ class Token:
         return f"Token({self.line}:{self.col}, {self.type}, {self.value})"
 
 
-# 定义 TokenStream 类，用于管理 token 列表的读取操作
-class TokenStream:
-    def __init__(self, filename):
-        # 初始化时从文件加载所有 token
-        self.tokens = self._load_tokens(filename)
-        self.current = 0  # 当前读取的位置索引
-
-    # 内部函数：从文件中读取所有 token 并存储到列表中
-    def _load_tokens(self, filename):
-        tokens = []
-        with open(filename, 'r', encoding='gbk') as file:
-            for line in file:
-                if not line.strip():  # 跳过空行
-                    continue
-                # 将每一行按制表符拆分为三个部分：位置、类型和值
-                pos, token_type, value = line.strip().split('\t')
-                # 位置形如 "3:5"，拆分为行号和列号
-                line_no, col_no = pos.split(':')
-                # 构造 Token 对象并添加到列表中
-                tokens.append(Token(line_no, col_no, token_type, value))
-        return tokens
-
-    # 获取当前 token 并将指针移动到下一个（类似迭代器的 next）
-    def next(self):
-        if self.current < len(self.tokens):
-            tok = self.tokens[self.current]
-            self.current += 1
-            return tok
-        return None  # 没有更多 token 时返回 None
-
-    # 查看当前 token 但不前进（用于语法分析中的 lookahead）
-    def peek(self, offset=0):
-        """
-        返回当前指针向前偏移 offset 的 token，但不移动指针。
-        offset=0 时等同于原 peek()：看下一个要 next() 的 token。
-        offset=1 则是再往后一个，以此类推。
-        """
-        idx = self.current + offset
-        if idx < len(self.tokens):
-            return self.tokens[idx]
-        return None
+# 输入末尾的哨兵 token：读到输入末尾之后得到它，而不是 None
+EOF_TOKEN = Token(0, 0, "EOF", "")
+# 末尾补的哨兵个数：current_token 可能已越过末尾一格，再向后最多看两个 token
+EOF_PAD = 3
 
-    # 重置读取指针到开头（用于测试或语法分析回溯）
-    def reset(self):
-        self.current = 0
+# 值需要驻留的 token 类型
+_INTERN_VALUE_TYPES = frozenset({"KEYWORD", "OPERATOR", "DELIMITER"})
 
 
-# 判断关键字类型
-KEYWORD_TYPES = {"int", "float", "bool", "char", "double", "void", "const"}
+def _load_tokens_fast(buf: bytes):
+    """
+    解析 token 文件的原始字节，返回 (lines, cols, types, values) 四列。
+    每行格式为 "行:列\t类型\t值"，空行跳过。
+    整个文件只解码一次、按行切分一次，每行用 partition 拆分，不构造中间列表。
+    """
+    lines, cols, types, values = [], [], [], []
+    add_line, add_col, add_type, add_value = lines.append, cols.append, types.append, values.append
+    # 类型标签与关键字/运算符/界符的值是封闭的小词表，驻留后比较时可走身份判断；
+    # 标识符和字面量的值不做驻留
+    intern = sys.intern
+    intern_types = _INTERN_VALUE_TYPES
+    for line in buf.decode('gbk').splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        pos, sep1, rest = line.partition('\t')
+        token_type, sep2, value = rest.partition('\t')
+        # 必须恰好三列；截断或损坏的行在加载时就报错，而不是变成错误的 token
+        if not sep1 or not sep2 or '\t' in value:
+            raise ValueError(f"malformed token line: {line!r}")
+        line_no, _, col_no = pos.partition(':')
+        token_type = intern(token_type)
+        # 行列号在这里一次性转成整数，Token 构造时不再转换
+        add_line(int(line_no))
+        add_col(int(col_no))
+        add_type(token_type)
+        add_value(intern(value) if token_type in intern_types else value)
+    return lines, cols, types, values
+
+
+# 定义 TokenStream 类：只保存从文件加载的 token 数据，读取位置由分析器维护
+class TokenStream:
+    def __init__(self, filename):
+        # 以字节一次性读入，交给按列解析的内核
+        with open(filename, 'rb') as file:
+            buf = file.read()
+        # 按列存放的行号、列号、类型与值（SoA），lookahead 只需读这几列
+        self.lines, self.cols, self.types, self.values = _load_tokens_fast(buf)
+        # 语法树、错误信息等仍需要完整的 Token 对象
+        self.tokens = list(map(Token, self.lines, self.cols, self.types, self.values))
+        # 每个 token 的整数种类编号，语句分派直接按它查表
+        self.kinds = token_kinds(self.types, self.values)
+        self.length = len(self.tokens)
 
 
-def is_type(tok_type, tok_val):
-    return tok_type == "KEYWORD" and tok_val in KEYWORD_TYPES
+# 判断关键字类型
+KEYWORD_TYPES = frozenset({"int", "float", "bool", "char", "double", "void", "const"})
+
+
+# 允许的隐式类型转换 (声明类型, 实际类型)：int 可以赋给 float
+WIDENING_PAIRS = frozenset({("float", "int")})
+
+# 语句 S 的 FIRST 集：除标识符外，按 (type, value) 或关键字值判断
+FIRST_S_PAIRS = frozenset({("OPERATOR", "++"), ("OPERATOR", "--"), ("DELIMITER", "{")})
+FIRST_S_KEYWORDS = frozenset({"if", "while", "for", "do", "break", "continue", "return"} | KEYWORD_TYPES)
+# 语句级错误恢复的同步符号：跳到 ';' 或 '}' 为止
+STMT_SYNC_PAIRS = frozenset({("DELIMITER", ";"), ("DELIMITER", "}")})
+
+# 各类运算符集合
+COMP_ASSIGN_OPS = frozenset({"=", "+=", "-=", "*=", "/=", "%="})  # 复合赋值
+ADD_OPS = frozenset({"+", "-"})  # 加减（也用作一元前缀）
+REL_OPS = frozenset({">", "<", ">=", "<=", "==", "!="})  # 关系运算
+LOGIC_OPS = frozenset({"&&", "||"})  # 逻辑运算
+INC_DEC_OPS = frozenset({"++", "--"})  # 自增自减
+DIV_OPS = frozenset({"/", "%"})  # 除数不能为 0 的运算
+BOOL_LITERALS = frozenset({"true", "false"})  # 布尔字面量
+# 表达式起始符号
+FACTOR_TYPES = frozenset({"IDENTIFIER", "LITERAL"})  # 以标识符或字面量开头
+RETURN_START_VALUES = frozenset({"!", "("})  # return 后的表达式
+ARG_START_VALUES = frozenset({"!", "++", "--", "("})  # 实参表达式
+# 顶层 "type id" 之后表示变量声明的符号
+DECL_FOLLOW_VALUES = frozenset({"=", ";", ","})
+
+# 二元运算符优先级（数值越大结合越紧），关系运算同级以保持 a < b < c 的连写语义
+BINARY_PREC = {
+    "||": 1,
+    "&&": 2,
+    "==": 3, "!=": 3, "<": 3, ">": 3, "<=": 3, ">=": 3,
+    "+": 4, "-": 4,
+    "*": 5, "/": 5, "%": 5,
+}
+REL_PREC = 3  # 关系运算的优先级
+ARITH_PREC = 4  # 只解析算术表达式时的起始优先级
+# 四元式编号起点：第 i 条四元式编号为 QUAD_BASE + i
+QUAD_BASE = 100
+# 两边都是常量时，关系运算在编译期直接求值
+REL_EVAL = {
+    ">": operator.gt, "<": operator.lt, ">=": operator.ge,
+    "<=": operator.le, "==": operator.eq, "!=": operator.ne,
+}
+
+# token 种类编号：加载时按 (type, value) 查表得到一个小整数，分派时按下标取表
+# 不在词表中的 token 按类型取通用编号
+K_EOF, K_IDENTIFIER, K_LITERAL, K_KEYWORD, K_OPERATOR, K_DELIMITER, K_OTHER = range(7)
+_GENERIC_KINDS = {
+    "EOF": K_EOF,
+    "IDENTIFIER": K_IDENTIFIER,
+    "LITERAL": K_LITERAL,
+    "KEYWORD": K_KEYWORD,
+    "OPERATOR": K_OPERATOR,
+    "DELIMITER": K_DELIMITER,
+}
+_KIND_VOCAB = (
+    [("KEYWORD", kw) for kw in ("if", "else", "while", "for", "do", "break", "continue", "return",
+                                "int", "float", "bool", "char", "double", "void", "const")]
+    + [("OPERATOR", op) for op in ("+", "-", "*", "/", "%", "=", "+=", "-=", "*=", "/=", "%=",
+                                   "==", "!=", "<", ">", "<=", ">=", "&&", "||", "!", "++", "--",
+                                   "(", ")")]
+    + [("DELIMITER", d) for d in (";", ",", "{", "}")]
+)
+_KIND_TABLE = {pair: kind for kind, pair in enumerate(_KIND_VOCAB, start=K_OTHER + 1)}
+KIND_COUNT = K_OTHER + 1 + len(_KIND_VOCAB)
+# 单个 token 判断常用的几个种类编号
+K_ELSE = _KIND_TABLE[("KEYWORD", "else")]
+K_CONST = _KIND_TABLE[("KEYWORD", "const")]
+K_SEMI = _KIND_TABLE[("DELIMITER", ";")]
+K_COMMA = _KIND_TABLE[("DELIMITER", ",")]
+
+# 类型关键字的种类编号，判断当前 token 是否为类型关键字
+TYPE_KINDS = frozenset(_KIND_TABLE[("KEYWORD", kw)] for kw in KEYWORD_TYPES)
+
+# 语句 S 的 FIRST 集（种类编号形式），parse_L 的循环条件只需一次集合判断
+FIRST_S_KINDS = frozenset(
+    [K_IDENTIFIER]
+    + [_KIND_TABLE[pair] for pair in FIRST_S_PAIRS]
+    + [_KIND_TABLE[("KEYWORD", kw)] for kw in FIRST_S_KEYWORDS]
+)
+# 顶层 Top 的 FIRST 集：类型关键字与匿名块；无类型的 main 是标识符，另行判断值
+FIRST_TOP_KINDS = TYPE_KINDS | {_KIND_TABLE[("DELIMITER", "{")]}
+
+
+def token_kinds(types, values):
+    """按 (type, value) 计算每个 token 的种类编号"""
+    table, generic = _KIND_TABLE, _GENERIC_KINDS
+    return [table.get((t, v)) or generic.get(t, K_OTHER) for t, v in zip(types, values)]
+
+
+def literal_const(lit):
+    """按字面量的写法得到 (类型, 常量值)"""
+    if '.' in lit or 'e' in lit or 'E' in lit:
+        return 'float', float(lit)
+    if lit in BOOL_LITERALS:
+        return 'bool', (lit == 'true')
+    if lit.startswith("'") and lit.endswith("'"):
+        return 'char', lit[1]
+    return 'int', int(lit)
+
+
+def _table_by_kind(pairs_to_val):
+    """
+    把以 (type, value) 为键的表展开成按种类编号下标访问的列表。
+    键也可以直接是种类编号（如 K_IDENTIFIER）。
+    """
+    out = [None] * KIND_COUNT
+    for key, val in pairs_to_val.items():
+        out[_KIND_TABLE[key] if isinstance(key, tuple) else key] = val
+    return out
 
 
 # 符号表条目
 class Symbol:
+    __slots__ = ('kind', 'name', 'type', 'params', 'scope_level', 'first_line', 'count', 'is_defined', 'value')
+
     def __init__(self, kind: str, name: str, typ: str,
                  params=None, scope_level: int = 0, line: int = 0,
                  is_defined: bool = False,
@@ -93,6 +213,20 @@ class Symbol:
     def increment(self):
         self.count += 1
 
+    # 导出为 dict（写 symbol_table.json 用），键顺序与字段定义一致
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'name': self.name,
+            'type': self.type,
+            'params': self.params,
+            'scope_level': self.scope_level,
+            'first_line': self.first_line,
+            'count': self.count,
+            'is_defined': self.is_defined,
+            'value': self.value,
+        }
+
 
 # 符号表
 class SymbolTable:
@@ -103,6 +237,8 @@ class SymbolTable:
         self.vars: List[Dict[str, Symbol]] = []
         # 变量作用域栈，每层为 dict[name->Symbol]
         self.var_scopes: List[Dict[str, Symbol]] = []
+        # 扁平视图：名字 -> 各层同名符号（由外到内），末尾即当前可见的那个
+        self._flat: Dict[str, List[Symbol]] = {}
         self.current_level = -1
         self.enter_scope()  # 创建全局变量作用域
 
@@ -114,6 +250,13 @@ class SymbolTable:
         if self.current_level >= 0:
             scope = self.var_scopes.pop()
             self.vars.append(scope)
+            # 退出作用域时撤掉这一层在扁平视图中的绑定
+            flat = self._flat
+            for name in scope:
+                visible = flat[name]
+                visible.pop()
+                if not visible:
+                    del flat[name]
             self.current_level -= 1
 
     def add_function(self, name: str, return_type: str,
@@ -122,9 +265,8 @@ class SymbolTable:
         existing = self.functions.get(name)
 
         # —— 不允许与变量同名 ——
-        for scope in self.var_scopes:
-            if name in scope:
-                raise Exception(f"[Semantic Error] Function '{name}' conflicts with variable name at line {line}")
+        if name in self._flat:
+            raise Exception(f"[Semantic Error] Function '{name}' conflicts with variable name at line {line}")
 
         if existing:
             # —— 重复声明检查 ——
@@ -150,19 +292,23 @@ class SymbolTable:
             raise Exception(f"[Semantic Error] Variable '{name}' conflicts with function name at line {line}")
 
         scope = self.var_scopes[self.current_level]
-        if name in scope:
-            scope[name].increment()
+        sym = scope.get(name)
+        if sym is not None:
+            sym.increment()
         else:
             sym = Symbol(kind=kind, name=name, typ=var_type,
                          scope_level=self.current_level, line=line,
                          value=init_value)
             scope[name] = sym
+            self._flat.setdefault(name, []).append(sym)
+        return sym
 
     def dump(self, path="./output/symbol_table.json"):
         os.makedirs(os.path.dirname(path), exist_ok=True)
         data = {
-            'functions': [vars(s) for s in self.functions.values()],
-            'variables': [vars(sym) for scope in (self.vars + self.var_scopes) for sym in scope.values()]
+            'functions': [sym.to_dict() for sym in self.functions.values()],
+            'variables': [sym.to_dict() for scope in chain(self.vars, self.var_scopes)
+                          for sym in scope.values()],
         }
         with open(path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
@@ -171,45 +317,50 @@ class SymbolTable:
         return self.functions.get(name)
 
     def lookup_variable(self, name: str) -> Optional[Symbol]:
-        for lvl in range(self.current_level, -1, -1):
-            if name in self.var_scopes[lvl]:
-                return self.var_scopes[lvl][name]
-        return None
+        visible = self._flat.get(name)
+        return visible[-1] if visible else None
 
     def lookup_var_in_current_scope(self, name: str) -> Optional[Symbol]:
         """只在当前作用域查找，检测重定义"""
         return self.var_scopes[self.current_level].get(name)
 
 
+# 关闭语法树输出时替换 _log/_enter/_exit 的空操作
+def _noop(*_):
+    pass
+
+
 # 语法分析器
 class SyntaxAnalyzer:
     def __init__(self, token_file="./token/tokens.txt",
                  output_file="./output/syntaxTree.txt",
-                 error_file: str = "./output/syntax_errors.txt"):
+                 error_file: str = "./output/syntax_errors.txt",
+                 trace: bool = False):
         self.error_file = error_file
-        # —— 1. 获取 logger 并清掉所有旧的 handler ——
-        self.logger = logging.getLogger("SyntaxTree")
-        self.logger.setLevel(logging.DEBUG)
-        for h in list(self.logger.handlers):
-            self.logger.removeHandler(h)
-
-        # —— 2. 新增 控制台 handler ——
-        ch = logging.StreamHandler(sys.stdout)
-        ch.setLevel(logging.DEBUG)
-        fmt = logging.Formatter("%(message)s")
-        ch.setFormatter(fmt)
-        self.logger.addHandler(ch)
-
-        # —— 3. 新增 文件 handler，用 'w' 模式确保每次都 truncate ——
-        fh = logging.FileHandler(output_file, mode="w", encoding='utf-8')
-        fh.setLevel(logging.DEBUG)
-        fh.setFormatter(fmt)
-        self.logger.addHandler(fh)
+        # trace 为 True 时才输出语法树，否则 _log/_enter/_exit 都是空操作
+        self.trace = trace
+        self.output_file = output_file
+        # 语法树的每一行先收集到列表里，解析结束后一次性输出到控制台和文件
+        self._tree_lines: List[str] = []
+        if trace:
+            # 预先生成各层缩进串，_log 时直接取
+            self._indent_strs = ["--" * i for i in range(256)]
+        else:
+            self._log = self._enter = self._exit = _noop
 
         self.tok = TokenStream(token_file)
-        self.current_token = None
+        # 读取位置由分析器自己维护：pos 为 current_token 的下标
+        # 末尾补上哨兵，peek 时直接下标取值，不必做越界检查
+        self._ntok = self.tok.length
+        self._tokens = self.tok.tokens + [EOF_TOKEN] * EOF_PAD
+        self._types = self.tok.types + [EOF_TOKEN.type] * EOF_PAD
+        self._values = self.tok.values + [EOF_TOKEN.value] * EOF_PAD
+        self._kinds = self.tok.kinds + [K_EOF] * EOF_PAD
+        self.pos = -1
+        self.current_token = EOF_TOKEN
         self.indent = 0
-        self.errors = []  # 用来收集错误
+        self.errors = []  # 用来收集错误：(消息或模板, 参数)
+        self._lit_cache = {}  # 字面量 → (类型, 常量值)，同一写法只转换一次
         self.last_token = None  # 记录上一个消费的 token,用于指定错误语句的行号
 
         # --- 符号表 ---
@@ -225,19 +376,27 @@ class SyntaxAnalyzer:
         self.break_stack: List[List[int]] = []
         self.continue_stack: List[List[int]] = []
 
-    def peek_n(self, n=0):
-        """
-        返回从 current_token 开始，向前看第 n 个 token，但不移动指针。
-        peek_n(0) == self.current_token
-        peek_n(1) == 下一个要 next() 的 token
-        依此类推
-        """
-        return self.tok.peek(n)
+    # 读入下一个 token，pos 最多停在末尾之后一格
+    def advance(self):
+        if self.pos < self._ntok:
+            self.pos += 1
+        self.current_token = self._tokens[self.pos]
 
     # 语法树缩进
     def _log(self, msg):
-        line = "--" * self.indent + msg
-        self.logger.debug(line)
+        indent = self.indent
+        prefix = self._indent_strs[indent] if indent < 256 else "--" * indent
+        self._tree_lines.append(prefix + msg)
+
+    # 把收集的语法树一次性写出：控制台打印一份，文件写一份
+    def _flush_tree(self):
+        if not self.trace:
+            return
+        lines = self._tree_lines
+        if lines:
+            print("\n".join(lines))
+        with open(self.output_file, "w", encoding="utf-8") as f:
+            f.write("".join(line + "\n" for line in lines))
 
     # 进入某个文法时打印
     def _enter(self, name):
@@ -249,23 +408,46 @@ class SyntaxAnalyzer:
         self.indent -= 1
         self._log(f"{name}分析结束")
 
-    # 检测当前单词是否与文法的预期匹配
+    # match 的快速路径：类型（及值）相符时直接前进，否则交给 match 做完整检查和报错。
+    # 当前 token 不是 EOF，所以 pos + 1 一定不越界
+    def match_type(self, expected_type):
+        tok = self.current_token
+        if tok.type == expected_type:
+            self.last_token = tok
+            self.pos += 1
+            self.current_token = self._tokens[self.pos]
+            return
+        self.match(expected_type)
+
+    def match_exact(self, expected_type, expected_val):
+        tok = self.current_token
+        if tok.value == expected_val and tok.type == expected_type:
+            self.last_token = tok
+            self.pos += 1
+            self.current_token = self._tokens[self.pos]
+            return
+        self.match(expected_type, expected_val)
+
+    # 检测当前单词是否与文法的预期匹配（完整检查，含多余右括号与输入结束的处理）
     def match(self, expected_type, expected_val=None):
         tok = self.current_token
-        if tok is None:
+        if tok.type == "EOF":
             self.error("Unexpected end of input", use_token=self.last_token)
 
         # 如果看到一个意外的右括号，但当前文法不期待 ')'
         if tok.type == "OPERATOR" and tok.value == ")" and not (expected_type == "OPERATOR" and expected_val == ")"):
             # 直接报告“多余右括号”，然后跳过
-            self.report_error(f"[Syntax Error] Unexpected ')' at line {tok.line}, col {tok.col}")
-            self.current_token = self.tok.next()
+            self.report_error("[Syntax Error] Unexpected ')' at line {}, col {}", tok.line, tok.col)
+            self.advance()
             return
 
         # 如果有具体的 expected_val，就只允许它作为错误提示
         if tok.type == expected_type and (expected_val is None or tok.value == expected_val):
             self.last_token = tok
-            self.current_token = self.tok.next()
+            # 前进一格（与 advance 相同，匹配成功的路径上省去一次方法调用）
+            if self.pos < self._ntok:
+                self.pos += 1
+            self.current_token = self._tokens[self.pos]
         else:
             exp = expected_val if expected_val is not None else expected_type
             # 这里直接报错
@@ -273,42 +455,49 @@ class SyntaxAnalyzer:
 
     def error(self, msg, use_token=None):
         # 如果传入了 use_token，就用它的行列；否则用当前 token
-        tok = use_token or self.current_token or Token(0, 0, "EOF", "")
+        tok = use_token or self.current_token
         full = f"[Syntax Error] {msg} at line {tok.line}, col {tok.col}"
         raise SyntaxError(full)
 
-    def report_error(self, exception):
-        # 记录错误字符串，不抛出
-        self.errors.append(str(exception))
+    def report_error(self, message, *args):
+        # 记录错误，不抛出；带参数时只存模板和参数，写文件时再格式化
+        self.errors.append((message, args))
+
+    # 把记录的错误格式化成字符串列表（按报告顺序）
+    def error_messages(self) -> List[str]:
+        return [str(message).format(*args) if args else str(message) for message, args in self.errors]
 
-    def sync_to(self, sync_values):
+    def sync_to(self, sync_pairs):
         """
-        跳过 token，直到碰到 sync_values 中的某个终结符。
-        sync_values 是一组 (type, value) 对。
+        跳过 token，直到碰到 sync_pairs 中的某个终结符。
+        sync_pairs 是一组 (type, value) 对，按集合成员判断。
         即跳过当前出现语法错误的行
         """
-        while self.current_token:
-            if any(self.current_token.type == t and (v is None or self.current_token.value == v)
-                   for t, v in sync_values):
-                return
-            self.current_token = self.tok.next()
-
-    # 检查变量是否重定义
-    def check_var_redefine(self, var_name: str, var_type: str, line):
-        # —— 语义动作：同一作用域重定义检测 ——
-        if self.symtab.lookup_var_in_current_scope(var_name):
+        types, values = self._types, self._values
+        pos = self.pos
+        while types[pos] != "EOF" and (types[pos], values[pos]) not in sync_pairs:
+            pos += 1
+        self.pos = pos
+        self.current_token = self._tokens[pos]
+
+    # 检查变量是否重定义，未重定义则登记到符号表
+    def declare_variable(self, var_name: str, var_type: str, line, is_const: bool = False) -> Optional[Symbol]:
+        """
+        重定义检测与登记合成一次当前作用域查找：
+        同一层已有同名变量时报错并返回 None，否则登记并返回新符号
+        """
+        if var_name in self.symtab.var_scopes[self.symtab.current_level]:
             # 同一层已有同名变量，报错但继续解析
-            self.report_error(f"[Semantic Error] Variable '{var_name}' redeclared in the same scope at line {line}")
-            return True
-        return False
-
-    def type_compatible(self, declared: str, actual: str) -> bool:
+            self.report_error("[Semantic Error] Variable '{}' redeclared in the same scope at line {}", var_name, line)
+            return None
+        return self.symtab.add_variable(var_name, var_type,
+                                        kind='CONST' if is_const else "variable",
+                                        line=line, init_value=None)
+
+    @staticmethod
+    def type_compatible(declared: str, actual: str, _widening=WIDENING_PAIRS) -> bool:
         # 简单规则：同名、int->float 允许，其它都不行
-        if declared == actual:
-            return True
-        if declared == "float" and actual == "int":
-            return True
-        return False
+        return declared == actual or (declared, actual) in _widening
 
     def new_temp(self) -> str:
         """生成一个新的临时变量名 t1, t2, ..."""
@@ -317,13 +506,13 @@ class SyntaxAnalyzer:
 
     def emit(self, op: str, a1: str, a2: Optional[str], res: str):
         """生成四元式, 并返回四元式编号"""
-        idx = len(self.quads) + 100  # 从 100 开始编号
+        idx = len(self.quads) + QUAD_BASE  # 从 100 开始编号
         self.quads.append((idx, op, a1 or "_", a2 or "_", res or "_"))
         return idx
 
     def next_quad(self) -> int:
         """返回下一条将要 emit 的四元式编号（从 100 开始）"""
-        return len(self.quads) + 100
+        return len(self.quads) + QUAD_BASE
 
     def makelist(self, idx: int) -> List[int]:
         """
@@ -342,11 +531,13 @@ class SyntaxAnalyzer:
 
     def backpatch(self, lst: List[int], target: int):
         """把 lst 中每条四元式的 result 字段改为 target 地址回填"""
+        # 四元式编号连续，编号减去 QUAD_BASE 就是列表下标，不必逐条查找
+        quads = self.quads
+        target = str(target)
         for idx in lst:
-            for i, (quad_no, op, a1, a2, res) in enumerate(self.quads):
-                if quad_no == idx:
-                    self.quads[i] = (quad_no, op, a1, a2, str(target))
-                    break
+            i = idx - QUAD_BASE
+            quad_no, op, a1, a2, _ = quads[i]
+            quads[i] = (quad_no, op, a1, a2, target)
 
     """
     下面是语法分析模块，采用递归下降，parse为入口函数
@@ -356,14 +547,17 @@ class SyntaxAnalyzer:
         # —— 在真正解析前，先把旧的错误文件清空 ——
         open(self.error_file, 'w', encoding='utf-8').close()
         # 开始分析
-        self.current_token = self.tok.next()
+        self.advance()
         try:
             self.parse_P()
         except SyntaxError as e:
             self.report_error(e)
+        finally:
+            # 即使解析中途抛出其它异常，已经生成的语法树也照常输出
+            self._flush_tree()
 
-        if self.current_token is not None:
-            self.report_error(f"Extra input after end of top-level block: {self.current_token}")
+        if self.current_token.type != "EOF":
+            self.report_error("Extra input after end of top-level block: {}", self.current_token)
 
         # —— 在这里做 main 函数存在性检查 ——
         main_sym = self.symtab.lookup_function("main")
@@ -373,25 +567,23 @@ class SyntaxAnalyzer:
             self.report_error("[Semantic Error] Missing 'main' function")
 
         # 在写入 errors 文件之前，加上未使用变量的警告
-        for scope in self.symtab.var_scopes + self.symtab.vars:
+        for scope in chain(self.symtab.var_scopes, self.symtab.vars):
             for sym in scope.values():
                 # 只检查普通变量（不包括参数、常量、函数名冲突等）
                 if sym.kind == 'variable' and sym.count == 1:
                     self.report_error(
-                        f"[Warning] Variable '{sym.name}' declared at line {sym.first_line} but never used"
+                        "[Warning] Variable '{}' declared at line {} but never used", sym.name, sym.first_line
                     )
 
         print("—— 解析结束 ——")
         # —— 在这里一次性把 errors 写到文件 ——
         with open(self.error_file, "w", encoding="utf-8") as f:
-            for e in self.errors:
-                f.write(e + "\n")
+            f.writelines(e + "\n" for e in self.error_messages())
         # 写入符号表
         self.symtab.dump()
         # 写入四元式
         with open("./output/quads.txt", "w", encoding="utf-8") as f:
-            for idx, op, a1, a2, res in self.quads:
-                f.write(f"{idx}: ({op}, {a1}, {a2}, {res})\n")
+            f.writelines(f"{idx}: ({op}, {a1}, {a2}, {res})\n" for idx, op, a1, a2, res in self.quads)
 
     # P → TopList
     def parse_P(self):
@@ -401,12 +593,11 @@ class SyntaxAnalyzer:
 
     # TopList → Top TopList | ε
     def parse_TopList(self):
-        while (self.current_token is not None
-               and (is_type(self.current_token.type, self.current_token.value)
-                    or (self.current_token.type == "DELIMITER"
-                        and self.current_token.value == "{")
-                    or (self.current_token.type == "IDENTIFIER"
-                        and self.current_token.value == "main"))):
+        kinds, values = self._kinds, self._values
+        while True:
+            kind = kinds[self.pos]
+            if not (kind in FIRST_TOP_KINDS or (kind == K_IDENTIFIER and values[self.pos] == "main")):
+                break
             self.parse_Top()
 
     """
@@ -421,107 +612,122 @@ class SyntaxAnalyzer:
     """
 
     def parse_Top(self):
-        if self.current_token:
-            # 允许 `main()` 无类型
-            if ((self.current_token.type == "IDENTIFIER" and self.current_token.value == "main")
-                    or (is_type(self.current_token.type, self.current_token.value) and
-                        self.peek_n().value == "main")):
-                # 进入 main 前
-                self.emit('main', '_', '_', '_')
-                self._enter("main 函数")
-                ret_type = self.current_token.value
-                if self.current_token.type == "KEYWORD":
-                    self.match("KEYWORD")
-                # 获取行号
-                line = self.current_token.line
-                self.match("IDENTIFIER", "main")
-                self.symtab.enter_scope()
-                # main 一定是定义（有函数体），标记 is_definition=True
-                self.symtab.add_function(name="main", param_types=[], return_type=ret_type,
-                                         line=line, is_definition=True)
-                self.match("OPERATOR", "(")
-                self.parse_ParamListOpt()
-                self.match("OPERATOR", ")")
-                if self.current_token.value == "{":
-                    self.match("DELIMITER", "{")
-                    self.parse_L()
-                    self.match("DELIMITER", "}")
-                    self.symtab.exit_scope()
-                    self.emit('sys', '_', '_', '_')
-                    self._exit("main 函数")
-                    return
-                else:
-                    self.error("Expected '{' after main function declaration")
-                return
-
-            elif is_type(self.current_token.type, self.current_token.value):
-                # —— 可选 const 前缀 ——
-                is_const = False
-                if self.current_token.type == "KEYWORD" and self.current_token.value == "const":
-                    is_const = True
-                    self.match("KEYWORD", "const")
-
-                # 需要区分是函数声明还是全局变量声明,向后提前查看两个单词
-                # 全局变量声明 int a = 1; 函数 int a() {} | ;
-                # 看下 3 个 token：type, id, 第三个 token
-                t1 = self.current_token  # KEYWORD int
-                t2 = self.peek_n()  # IDENTIFIER a
-                t3 = self.tok.peek(1)  # 偏移 1 => 第三个 token
-
-                if t2 and t2.type == "IDENTIFIER" and t3:
-                    if t3.value == "(":  # int a ( …  → 函数声明/定义
-                        self.parse_FunDef()
-                    elif t3.value in ("=", ";", ","):  # int a = …; 或 int a; → 变量声明
-                        self.parse_D(is_const=is_const)
-                    else:
-                        self.error(f"Unexpected token {t3} after type+id")
-                else:
-                    self.error("Expected identifier after type")
+        # 按当前 token 的种类编号查表分派：类型关键字 / 无类型的 main / 匿名块
+        handler = self._TOP_DISPATCH[self._kinds[self.pos]]
+        if handler is None:
+            self.error("Expect FunDef or block")
+        handler(self)
 
-                return
+    # MainFunDef → [type] main ( ParamListOpt ) { L }
+    def _parse_main(self):
+        # 进入 main 前
+        self.emit('main', '_', '_', '_')
+        self._enter("main 函数")
+        tok = self.current_token
+        ret_type = tok.value
+        if tok.type == "KEYWORD":
+            self.match_type("KEYWORD")
+        # 获取行号
+        line = self.current_token.line
+        self.match_exact("IDENTIFIER", "main")
+        self.symtab.enter_scope()
+        # main 一定是定义（有函数体），标记 is_definition=True
+        self.symtab.add_function(name="main", param_types=[], return_type=ret_type,
+                                 line=line, is_definition=True)
+        self.match_exact("OPERATOR", "(")
+        self.parse_ParamListOpt()
+        self.match_exact("OPERATOR", ")")
+        if self.current_token.value == "{":
+            self.match_exact("DELIMITER", "{")
+            self.parse_L()
+            self.match_exact("DELIMITER", "}")
+            self.symtab.exit_scope()
+            self.emit('sys', '_', '_', '_')
+            self._exit("main 函数")
+        else:
+            self.error("Expected '{' after main function declaration")
 
-            elif self.current_token.type == "DELIMITER" and self.current_token.value == "{":
-                self._enter("块")
-                self.symtab.enter_scope()
-                self.match("DELIMITER", "{")
-                self.parse_L()
-                self.match("DELIMITER", "}")
-                self.symtab.exit_scope()
-                self._exit("块")
-                return
+    # 类型关键字开头：main、函数声明/定义或全局变量声明
+    def _parse_top_typed(self):
+        # 允许 `int main()` 这种带返回类型的 main
+        if self._values[self.pos + 1] == "main":
+            self._parse_main()
+            return
+
+        # —— 可选 const 前缀 ——
+        is_const = False
+        if self._kinds[self.pos] == K_CONST:
+            is_const = True
+            self.match_exact("KEYWORD", "const")
+
+        # 需要区分是函数声明还是全局变量声明,向后提前查看两个单词
+        # 全局变量声明 int a = 1; 函数 int a() {} | ;
+        # 看下 3 个 token：type, id, 第三个 token
+        # 直接按下标读后两个 token，末尾有 EOF 哨兵兜底
+        t2 = self._tokens[self.pos + 1]  # IDENTIFIER a
+        t3 = self._tokens[self.pos + 2]  # 第三个 token
+
+        if t2.type == "IDENTIFIER" and t3.type != "EOF":
+            if t3.value == "(":  # int a ( …  → 函数声明/定义
+                self.parse_FunDef()
+            elif t3.value in DECL_FOLLOW_VALUES:  # int a = …; 或 int a; → 变量声明
+                self.parse_D(is_const=is_const)
+            else:
+                self.error(f"Unexpected token {t3} after type+id")
         else:
-            self.error("Expect FunDef or block")
+            self.error("Expected identifier after type")
+
+    # 顶层匿名块 { L }
+    def _parse_top_block(self):
+        self._enter("块")
+        self.symtab.enter_scope()
+        self.match_exact("DELIMITER", "{")
+        self.parse_L()
+        self.match_exact("DELIMITER", "}")
+        self.symtab.exit_scope()
+        self._exit("块")
+
+    # parse_Top 的分派表：种类编号 -> 对应顶层结构的解析方法
+    # 无类型的 main 以标识符开头，parse_TopList 保证此时的标识符就是 main
+    _TOP_DISPATCH = _table_by_kind({
+        **dict.fromkeys(TYPE_KINDS, _parse_top_typed),
+        ("DELIMITER", "{"): _parse_top_block,
+        K_IDENTIFIER: _parse_main,
+    })
 
     # FunDef → type id (ParamListOpt) {L}
     def parse_FunDef(self):
-        if is_type(self.current_token.type, self.current_token.value):
+        if self._kinds[self.pos] in TYPE_KINDS:
             self._enter("函数定义")
             # 收集函数类型
             func_type = self.current_token.value
-            self.match("KEYWORD")
+            self.match_type("KEYWORD")
             # 收集函数名称
             func_name = self.current_token.value
-            self.match("IDENTIFIER")
+            self.match_type("IDENTIFIER")
 
             # 作用域层级 + 1
             self.symtab.enter_scope()
 
-            self.match("OPERATOR", "(")
+            self.match_exact("OPERATOR", "(")
             # 收集函数参数
             params = self.collect_params()
 
-            self.match("OPERATOR", ")")
+            self.match_exact("OPERATOR", ")")
 
-            if self.current_token and self.current_token.type == "DELIMITER" and self.current_token.value == ";":
+            # 函数头之后的 ';' 或 '{'：取一次当前 token，后面的分支判断都用它
+            tok = self.current_token
+            tt, tv = tok.type, tok.value
+            if tt == "DELIMITER" and tv == ";":
                 self._enter("函数声明")
                 self.symtab.add_function(name=func_name, return_type=func_type, param_types=[],
-                                         line=self.current_token.line, is_definition=False)
+                                         line=tok.line, is_definition=False)
                 # 更新函数签名
                 self.symtab.functions[func_name].params = [f"{ptype} {pname} " for ptype, pname, _ in params]
-                self.match("DELIMITER", ";")  # 函数声明
+                self.match_exact("DELIMITER", ";")  # 函数声明
 
                 self._exit("函数声明")
-            elif self.current_token and self.current_token.type == "DELIMITER" and self.current_token.value == "{":
+            elif tt == "DELIMITER" and tv == "{":
                 # 如果是函数定义则需要将函数中的参数加入符号表
                 for ptype, pname, pline in params:
                     if pname is not None:
@@ -532,15 +738,15 @@ class SyntaxAnalyzer:
                 # 如果是函数定义，则需要生成函数签名
                 self.emit(func_name, "_", "_", "_")
                 self.symtab.add_function(name=func_name, return_type=func_type, param_types=[],
-                                         line=self.current_token.line, is_definition=True)
+                                         line=tok.line, is_definition=True)
                 # 更新函数签名
                 self.symtab.functions[func_name].params = [f"{pname} " for ptype, pname, _ in params]
-                self.match("DELIMITER", "{")
+                self.match_exact("DELIMITER", "{")
                 self.parse_L()
-                self.match("DELIMITER", "}")
+                self.match_exact("DELIMITER", "}")
 
             else:
-                self.error("Expected ';' or '{' after function signature", use_token=self.current_token)
+                self.error("Expected ';' or '{' after function signature", use_token=tok)
 
             # 作用域层级 - 1
             self.symtab.exit_scope()
@@ -549,68 +755,57 @@ class SyntaxAnalyzer:
 
     def collect_params(self):
         params = []
-        if is_type(self.current_token.type, self.current_token.value):
+        if self._kinds[self.pos] in TYPE_KINDS:
             while True:
                 ptype = self.current_token.value
-                self.match('KEYWORD')
+                self.match_type("KEYWORD")
                 pname = None
-                pline = self.current_token.line
-                if self.current_token.type == 'IDENTIFIER':
-                    pname = self.current_token.value
-                    self.match('IDENTIFIER')
+                tok = self.current_token
+                pline = tok.line
+                if tok.type == 'IDENTIFIER':
+                    pname = tok.value
+                    self.match_type("IDENTIFIER")
                 params.append((ptype, pname, pline))
                 if self.current_token.value != ',': break
-                self.match('DELIMITER', ',')
+                self.match_exact('DELIMITER', ',')
         return params
 
     #   ParamListOpt → ParamList | ε
     def parse_ParamListOpt(self):
         # 仅当下一个是 type 时才进入
-        if is_type(self.current_token.type, self.current_token.value):
+        if self._kinds[self.pos] in TYPE_KINDS:
             self.parse_ParamList()
         # 否则 ε，什么都不做
 
     # ParamList → Param ( "," Param )*
     def parse_ParamList(self):
         self.parse_Param()
-        while self.current_token and \
-                self.current_token.type == "DELIMITER" and \
+        while self.current_token.type == "DELIMITER" and \
                 self.current_token.value == ",":
-            self.match("DELIMITER", ",")
+            self.match_exact("DELIMITER", ",")
             self.parse_Param()
 
     # Param → type [ id ]
     def parse_Param(self):
         self._enter("参数")
-        self.match("KEYWORD")
+        self.match_type("KEYWORD")
         # 如果后面是标识符，再把它吃掉；否则跳过
-        if self.current_token and self.current_token.type == "IDENTIFIER":
-            self.match("IDENTIFIER")
+        if self.current_token.type == "IDENTIFIER":
+            self.match_type("IDENTIFIER")
         self._exit("参数")
 
     # L -> S L | ε
     def parse_L(self):
         """多条语句"""
-        while self.current_token is not None and (
-                # 赋值语句或后缀自增开头
-                self.current_token.type == "IDENTIFIER"
-                or (self.current_token.type == "OPERATOR"
-                    and self.current_token.value in ("++", "--"))
-                # 声明语句以类型关键字开头
-                or is_type(self.current_token.type, self.current_token.value)
-                # 块语句
-                or (self.current_token.type == "DELIMITER" and self.current_token.value == "{")
-                # if/while/for/do/break/continue/return 开头
-                or (self.current_token.type == "KEYWORD" and self.current_token.value in
-                    {"if", "while", "for", "do", "break", "continue", "return"})
-        ):
+        # 当前 token 的种类编号属于 S 的 FIRST 集才继续，EOF 自然不在其中
+        while self._kinds[self.pos] in FIRST_S_KINDS:
             try:
                 self.parse_S()
             except SyntaxError as e:
                 self.report_error(e)
-                self.sync_to({("DELIMITER", ";"), ("DELIMITER", "}")})
-                if self.current_token and self.current_token.value == ';':
-                    self.current_token = self.tok.next()
+                self.sync_to(STMT_SYNC_PAIRS)
+                if self.current_token.value == ';':
+                    self.advance()
 
     """
     S   → F 
@@ -629,330 +824,347 @@ class SyntaxAnalyzer:
     """
 
     def parse_S(self):
-        if self.current_token.type == "DELIMITER" and self.current_token.value == ";":
-            self._enter("空语句")
-            self.match("DELIMITER", ";")
-            self._exit("空语句")
+        # 以 (type, value) 唯一确定的语句按种类编号直接查表分派
+        handler = self._S_DISPATCH[self._kinds[self.pos]]
+        if handler is not None:
+            handler(self)
+            return
+
+        # 查表未命中时才取当前 token，后面的分支判断都用这份局部变量
+        cur = self.current_token
+        tt, tv = cur.type, cur.value
 
         # 函数调用也当作表达式语句
         # 如果看到 IDENTIFIER 后面紧跟 '(', 就当作调用
         # 如果看到了 ++ 或 --，或是标识符后面直接跟 ++/--，
         # 就当成一条“表达式语句”：parse_F 再 match 分号
         # 函数调用或其他 F 导出的表达式语句
-        elif (self.current_token.type == "IDENTIFIER"
-              and self.peek_n().type == "OPERATOR"
-              and self.peek_n().value == "(") \
-                or (self.current_token.type == "OPERATOR"
-                    and self.current_token.value in ("++", "--")) \
-                or (self.current_token.type == "IDENTIFIER"
-                    and self.peek_n().type == "OPERATOR"
-                    and self.peek_n().value in ("++", "--")):
+        # 下一个 token 直接按下标从列里读（末尾有 EOF 哨兵）
+        nxt = self.pos + 1
+        if (tt == "IDENTIFIER"
+            and self._types[nxt] == "OPERATOR"
+            and (self._values[nxt] == "(" or self._values[nxt] in INC_DEC_OPS)) \
+                or (tt == "OPERATOR"
+                    and tv in INC_DEC_OPS):
             self._enter("表达式语句")
             self.parse_F()
-            self.match("DELIMITER", ";")
+            self.match_exact("DELIMITER", ";")
             self._exit("表达式语句")
             return
 
         # 赋值语句
-        elif self.current_token.type == "IDENTIFIER":
+        elif tt == "IDENTIFIER":
             self._enter("赋值语句")
-            lhs_name = self.current_token.value
-            line = self.current_token.line
-            self.match("IDENTIFIER")
+            lhs_name = tv
+            line = cur.line
+            self.match_type("IDENTIFIER")
             # 检查是否为常量，如果为常量则不能赋值
             sym = self.symtab.lookup_variable(lhs_name)
             if sym and sym.kind == "CONST":
-                self.report_error(f"[Semantic Error] Cannot assign to constant '{lhs_name}' at line {line}")
+                self.report_error("[Semantic Error] Cannot assign to constant '{}' at line {}", lhs_name, line)
             elif sym:
                 # 赋值的左值也算一次使用
                 sym.increment()
 
-            # 检查左值是否已声明
-            if not self.symtab.lookup_variable(lhs_name):
+            # 检查左值是否已声明（沿用上面查到的 sym，不再重复查找）
+            if not sym:
                 self.report_error(
-                    f"[Semantic Error] Assignment to undeclared variable '{lhs_name}' at line {self.last_token.line}")
-            if self.current_token.type == "OPERATOR" and self.current_token.value == "=":
-                self.match("OPERATOR", "=")
-                rhs_type, rhs_val, rhs_place = self.parse_E()
+                    "[Semantic Error] Assignment to undeclared variable '{}' at line {}", lhs_name, self.last_token.line)
+            tok = self.current_token
+            if tok.type == "OPERATOR" and tok.value == "=":
+                self.match_exact("OPERATOR", "=")
+                rhs_type, rhs_val, rhs_place = self.parse_expr(ARITH_PREC)
                 # 如果是编译期常量，就写回 sym.value
                 if sym and rhs_val is not None:
                     sym.value = rhs_val
                 # 插入三地址码：  b = rhs_place
                 self.emit("=", rhs_place, None, lhs_name)
-                self.match("DELIMITER", ";")
+                self.match_exact("DELIMITER", ";")
             else:
                 self.error("Expected assignment operator …")
             self._exit("赋值语句")
 
-        # 块语句
-        elif self.current_token.type == "DELIMITER" and self.current_token.value == "{":
-            # 1) 进入新块作用域
-            self.symtab.enter_scope()
-            self.match("DELIMITER", "{")
-            self.parse_L()
-            self.match("DELIMITER", "}")
-            # 2) 退出新块作用域
-            self.symtab.exit_scope()
-            return
-
-        # if 语句
-        elif self.current_token.type == "KEYWORD" and self.current_token.value == "if":
-            self._enter("if语句")
-            self.match("KEYWORD", "if")
-            self.match("OPERATOR", "(")
-
-            # 正确解构 parse_B 的三个返回值
-            _, true_list, false_list = self.parse_B()
-
-            self.match("OPERATOR", ")")
-
-            # 回填 true_list 到 then 语句的起始地址
-            then_quad = self.next_quad()
-            self.backpatch(true_list, then_quad)
-
-            # 解析 then 语句
-            self.parse_S()
-
-            # 看是否存在 else 分支
-            if self.current_token.type == "KEYWORD" and self.current_token.value == "else":
-                # 插入跳转语句，跳过 else，稍后回填
-                skip_else_quad = self.emit("j", "_", "_", "_")
-
-                else_quad = self.next_quad()
-                self.backpatch(false_list, else_quad)
-
-                # 匹配 else 分支
-                self.match("KEYWORD", "else")
-                self.parse_S()
-
-                after_if = self.next_quad()
-                # 回填 jmp 跳出 else 的目标地址
-                self.backpatch([skip_else_quad], after_if)
-            else:
-                # 无 else，直接回填 false_list 到 if 语句之后
-                after_if = self.next_quad()
-                self.backpatch(false_list, after_if)
-
-            self._exit("if语句")
-            return
-
-        # while 语句
-        elif self.current_token.type == "KEYWORD" and self.current_token.value == "while":
-            self._enter("while语句")
-            # push break/continue 列表
-            self.break_stack.append([])
-            self.continue_stack.append([])
-            # 1. 记录循环开始位置
-            loop_start = self.next_quad()
-
-            # 消费 'while' 和 '('
-            self.match("KEYWORD", "while")
-            self.match("OPERATOR", "(")
-
-            # 2. 生成条件测试的 truelist/falselist
-            _, truelist, falselist = self.parse_B()
-
-            # 3. 回填 true 跳转到循环体第一条语句
-            body_quad = self.next_quad()
-            self.backpatch(truelist, body_quad)
-
-            # 消费 ')'
-            self.match("OPERATOR", ")")
-
-            # 4. 生成循环体
-            self.parse_S()
-
-            # 5. 循环体末尾无条件跳回测试
-            self.emit("j", "_", "_", str(loop_start))
-
-            # 回填 continue → 跳回 loop_start
-            cont_list = self.continue_stack.pop()
-            if cont_list:
-                self.backpatch(cont_list, loop_start)
-
-            # 6. 回填 false 跳出循环到当前下一条
-            after_loop = self.next_quad()
-            # 回填 while 条件假时和所有 break 跳出的目标
-            # 先假跳转
-            self.backpatch(falselist, after_loop)
-            # 再回填所有 break
-            br_list = self.break_stack.pop()
-
-            if br_list:
-                self.backpatch(br_list, after_loop)
-
-            self._exit("while语句")
-            return
-
-        # for 语句
-        elif self.current_token.type == "KEYWORD" and self.current_token.value == "for":
-            self._enter("for语句")
-            # *[新增]* push break/continue 列表
-            self.break_stack.append([])
-            self.continue_stack.append([])
-
-            # 1. 消费 'for' 和 '('
-            self.match("KEYWORD", "for")
-            self.match("OPERATOR", "(")
-
-            # 2. 先处理 Init 部分（可能是赋值或声明）
-            #    这里不生成跳转指令，只消费掉 init
-            self.parse_ForInit()
-            self.match("DELIMITER", ";")
-
-            # 3. 记录条件判断开始的位置
-            cond_quad = self.next_quad()
-
-            # 4. 解析条件表达式 B → 得到 truelist/falselist
-            _, truelist, falselist = self.parse_B()
-            self.match("DELIMITER", ";")
-
-            # 5. 在迭代之前，跳到循环体：回填 truelist
-            body_quad = self.next_quad()
-            self.backpatch(truelist, body_quad)
-
-            # 6. 暂时记下迭代部分开始，用于后面 emit
-            #    （这里我们不需要编号，只直接生成）
-            #    消费 iter 部分但不落分号
-            self.parse_ForIter()
-            self.match("OPERATOR", ")")
-
-            # 7. 生成循环体
-            self.parse_S()
-
-            # 8. 循环体末尾先执行 Iter 部分的中间码
-            #    （如果 parse_ForIter 内 emit 了四元式，就已经插入了
-            #     否则请在 parse_ForIter 中加入对应 emit）
-            #    然后无条件跳回条件判断
-            self.emit("j", "_", "_", str(cond_quad))
-
-            # *[新增]* 回填 continue → 跳到 cond_quad（循环条件处）
-            cont_list = self.continue_stack.pop()
-            if cont_list:
-                self.backpatch(cont_list, cond_quad)
-
-            # 9. 最后回填 falselist 到循环退出后第一条
-            after_for = self.next_quad()
-            # 回填 for 条件假时和所有 break 跳出的目标
-            self.backpatch(falselist, after_for)
-            br_list = self.break_stack.pop()
-            if br_list:
-                self.backpatch(br_list, after_for)
-
-            self._exit("for语句")
-            return
-
-        # do-while 语句
-        elif self.current_token.type == "KEYWORD" and self.current_token.value == "do":
-            self._enter("do-while语句")
-
-            # push break/continue 列表
-            self.break_stack.append([])
-            self.continue_stack.append([])
-
-            # 1. 记录循环体开始位置
-            loop_start = self.next_quad()
-
-            # 2. 消费 'do' 并生成循环体
-            self.match("KEYWORD", "do")
-            self.parse_S()
-
-            # 3. 消费 'while' 和 '('，准备解析条件
-            self.match("KEYWORD", "while")
-            self.match("OPERATOR", "(")
-
-            # 4. 生成条件测试的 truelist/falselist
-            _, truelist, falselist = self.parse_B()
-
-            # 5. 回填 truelist 到循环体开始位置，实现真则重回 do
-            self.backpatch(truelist, loop_start)
-
-            # 6. 消费 ')' 和 ';'
-            self.match("OPERATOR", ")")
-            self.match("DELIMITER", ";")
-
-            # 回填 continue → 跳回 loop_start
-            cont_list = self.continue_stack.pop()
-            if cont_list:
-                self.backpatch(cont_list, loop_start)
-
-            # 7. 回填 falselist 到循环结束后的下一条四元式
-            after_do = self.next_quad()
-            # 回填 do-while 条件假时和所有 break 跳出的目标
-            self.backpatch(falselist, after_do)
-            br_list = self.break_stack.pop()
-            if br_list:
-                self.backpatch(br_list, after_do)
-
-            self._exit("do-while语句")
-            return
-
-        # break 语句
-        elif self.current_token.type == "KEYWORD" and self.current_token.value == "break":
-            self._enter("break语句")
-            self.match("KEYWORD", "break")
-            # emit 一个占位的无条件跳转，目标待回填
-            idx = self.emit("j", "_", "_", "_")
-            # 收集到当前最内层循环的 break_list
-
-            if self.break_stack:
-                self.break_stack[-1].append(idx)
-                self.match("DELIMITER", ";")
-                self._exit("break语句")
-            return
-
-        # continue语句
-        elif self.current_token.type == "KEYWORD" and self.current_token.value == "continue":
-            self._enter("continue语句")
-            self.match("KEYWORD", "continue")
-            # emit 一个占位的无条件跳转，目标待回填
-            idx = self.emit("j", "_", "_", "_")
-            # 收集到当前最内层循环的 continue_list
-
-            if self.continue_stack:
-                self.continue_stack[-1].append(idx)
-            self.match("DELIMITER", ";")
-            self._exit("continue语句")
-            return
-
-        # return 语句
-        elif self.current_token.type == "KEYWORD" and self.current_token.value == "return":
-            self._enter("return语句")
-            self.match("KEYWORD", "return")
-            # 如果紧跟分号，说明是无返回值的 return;
-            if self.current_token.type == "DELIMITER" and self.current_token.value == ";":
-                ret_place = None
-            else:
-                # 解析返回表达式，parse_B 现在返回 (type, const_val, place)
-                _, _, ret_place = self.parse_E()
-            self.match("DELIMITER", ";")
-            # 根据是否有返回值，生成不同的四元式
-            if ret_place is not None:
-                # 带返回值的 return
-                self.emit("ret", ret_place, None, "_")
-            else:
-                # 无返回值的 return
-                self.emit("ret", "_", None, "_")
-            self._exit("return语句")
-            return
-
         # 变量声明语句（type 开头）
-        elif is_type(self.current_token.type, self.current_token.value):
+        elif self._kinds[self.pos] in TYPE_KINDS:
             self.parse_D()
         else:
             self.error("Expected assignment, block, if, or declaration statement")
 
+    # 空语句
+    def _parse_empty_stmt(self):
+        self._enter("空语句")
+        self.match_exact("DELIMITER", ";")
+        self._exit("空语句")
+
+    # 块语句
+    def _parse_block_stmt(self):
+        # 1) 进入新块作用域
+        self.symtab.enter_scope()
+        self.match_exact("DELIMITER", "{")
+        self.parse_L()
+        self.match_exact("DELIMITER", "}")
+        # 2) 退出新块作用域
+        self.symtab.exit_scope()
+
+    # if 语句
+    def _parse_if(self):
+        self._enter("if语句")
+        self.match_exact("KEYWORD", "if")
+        self.match_exact("OPERATOR", "(")
+
+        # 正确解构 parse_B 的三个返回值
+        _, true_list, false_list = self.parse_B()
+
+        self.match_exact("OPERATOR", ")")
+
+        # 回填 true_list 到 then 语句的起始地址
+        then_quad = self.next_quad()
+        self.backpatch(true_list, then_quad)
+
+        # 解析 then 语句
+        self.parse_S()
+
+        # 看是否存在 else 分支
+        if self._kinds[self.pos] == K_ELSE:
+            # 插入跳转语句，跳过 else，稍后回填
+            skip_else_quad = self.emit("j", "_", "_", "_")
+
+            else_quad = self.next_quad()
+            self.backpatch(false_list, else_quad)
+
+            # 匹配 else 分支
+            self.match_exact("KEYWORD", "else")
+            self.parse_S()
+
+            after_if = self.next_quad()
+            # 回填 jmp 跳出 else 的目标地址
+            self.backpatch([skip_else_quad], after_if)
+        else:
+            # 无 else，直接回填 false_list 到 if 语句之后
+            after_if = self.next_quad()
+            self.backpatch(false_list, after_if)
+
+        self._exit("if语句")
+
+    # while 语句
+    def _parse_while(self):
+        self._enter("while语句")
+        # push break/continue 列表
+        self.break_stack.append([])
+        self.continue_stack.append([])
+        # 1. 记录循环开始位置
+        loop_start = self.next_quad()
+
+        # 消费 'while' 和 '('
+        self.match_exact("KEYWORD", "while")
+        self.match_exact("OPERATOR", "(")
+
+        # 2. 生成条件测试的 truelist/falselist
+        _, truelist, falselist = self.parse_B()
+
+        # 3. 回填 true 跳转到循环体第一条语句
+        body_quad = self.next_quad()
+        self.backpatch(truelist, body_quad)
+
+        # 消费 ')'
+        self.match_exact("OPERATOR", ")")
+
+        # 4. 生成循环体
+        self.parse_S()
+
+        # 5. 循环体末尾无条件跳回测试
+        self.emit("j", "_", "_", str(loop_start))
+
+        # 回填 continue → 跳回 loop_start
+        cont_list = self.continue_stack.pop()
+        if cont_list:
+            self.backpatch(cont_list, loop_start)
+
+        # 6. 回填 false 跳出循环到当前下一条
+        after_loop = self.next_quad()
+        # 回填 while 条件假时和所有 break 跳出的目标
+        # 先假跳转
+        self.backpatch(falselist, after_loop)
+        # 再回填所有 break
+        br_list = self.break_stack.pop()
+
+        if br_list:
+            self.backpatch(br_list, after_loop)
+
+        self._exit("while语句")
+
+    # for 语句
+    def _parse_for(self):
+        self._enter("for语句")
+        # *[新增]* push break/continue 列表
+        self.break_stack.append([])
+        self.continue_stack.append([])
+
+        # 1. 消费 'for' 和 '('
+        self.match_exact("KEYWORD", "for")
+        self.match_exact("OPERATOR", "(")
+
+        # 2. 先处理 Init 部分（可能是赋值或声明）
+        #    这里不生成跳转指令，只消费掉 init
+        self.parse_ForInit()
+        self.match_exact("DELIMITER", ";")
+
+        # 3. 记录条件判断开始的位置
+        cond_quad = self.next_quad()
+
+        # 4. 解析条件表达式 B → 得到 truelist/falselist
+        _, truelist, falselist = self.parse_B()
+        self.match_exact("DELIMITER", ";")
+
+        # 5. 在迭代之前，跳到循环体：回填 truelist
+        body_quad = self.next_quad()
+        self.backpatch(truelist, body_quad)
+
+        # 6. 暂时记下迭代部分开始，用于后面 emit
+        #    （这里我们不需要编号，只直接生成）
+        #    消费 iter 部分但不落分号
+        self.parse_ForIter()
+        self.match_exact("OPERATOR", ")")
+
+        # 7. 生成循环体
+        self.parse_S()
+
+        # 8. 循环体末尾先执行 Iter 部分的中间码
+        #    （如果 parse_ForIter 内 emit 了四元式，就已经插入了
+        #     否则请在 parse_ForIter 中加入对应 emit）
+        #    然后无条件跳回条件判断
+        self.emit("j", "_", "_", str(cond_quad))
+
+        # *[新增]* 回填 continue → 跳到 cond_quad（循环条件处）
+        cont_list = self.continue_stack.pop()
+        if cont_list:
+            self.backpatch(cont_list, cond_quad)
+
+        # 9. 最后回填 falselist 到循环退出后第一条
+        after_for = self.next_quad()
+        # 回填 for 条件假时和所有 break 跳出的目标
+        self.backpatch(falselist, after_for)
+        br_list = self.break_stack.pop()
+        if br_list:
+            self.backpatch(br_list, after_for)
+
+        self._exit("for语句")
+
+    # do-while 语句
+    def _parse_do(self):
+        self._enter("do-while语句")
+
+        # push break/continue 列表
+        self.break_stack.append([])
+        self.continue_stack.append([])
+
+        # 1. 记录循环体开始位置
+        loop_start = self.next_quad()
+
+        # 2. 消费 'do' 并生成循环体
+        self.match_exact("KEYWORD", "do")
+        self.parse_S()
+
+        # 3. 消费 'while' 和 '('，准备解析条件
+        self.match_exact("KEYWORD", "while")
+        self.match_exact("OPERATOR", "(")
+
+        # 4. 生成条件测试的 truelist/falselist
+        _, truelist, falselist = self.parse_B()
+
+        # 5. 回填 truelist 到循环体开始位置，实现真则重回 do
+        self.backpatch(truelist, loop_start)
+
+        # 6. 消费 ')' 和 ';'
+        self.match_exact("OPERATOR", ")")
+        self.match_exact("DELIMITER", ";")
+
+        # 回填 continue → 跳回 loop_start
+        cont_list = self.continue_stack.pop()
+        if cont_list:
+            self.backpatch(cont_list, loop_start)
+
+        # 7. 回填 falselist 到循环结束后的下一条四元式
+        after_do = self.next_quad()
+        # 回填 do-while 条件假时和所有 break 跳出的目标
+        self.backpatch(falselist, after_do)
+        br_list = self.break_stack.pop()
+        if br_list:
+            self.backpatch(br_list, after_do)
+
+        self._exit("do-while语句")
+
+    # break 语句
+    def _parse_break(self):
+        self._enter("break语句")
+        self.match_exact("KEYWORD", "break")
+        # emit 一个占位的无条件跳转，目标待回填
+        idx = self.emit("j", "_", "_", "_")
+        # 收集到当前最内层循环的 break_list
+
+        if self.break_stack:
+            self.break_stack[-1].append(idx)
+            self.match_exact("DELIMITER", ";")
+            self._exit("break语句")
+
+    # continue语句
+    def _parse_continue(self):
+        self._enter("continue语句")
+        self.match_exact("KEYWORD", "continue")
+        # emit 一个占位的无条件跳转，目标待回填
+        idx = self.emit("j", "_", "_", "_")
+        # 收集到当前最内层循环的 continue_list
+
+        if self.continue_stack:
+            self.continue_stack[-1].append(idx)
+        self.match_exact("DELIMITER", ";")
+        self._exit("continue语句")
+
+    # return 语句
+    def _parse_return(self):
+        self._enter("return语句")
+        self.match_exact("KEYWORD", "return")
+        # 如果紧跟分号，说明是无返回值的 return;
+        if self._kinds[self.pos] == K_SEMI:
+            ret_place = None
+        else:
+            # 解析返回表达式，parse_expr 返回 (type, const_val, place)
+            _, _, ret_place = self.parse_expr(ARITH_PREC)
+        self.match_exact("DELIMITER", ";")
+        # 根据是否有返回值，生成不同的四元式
+        if ret_place is not None:
+            # 带返回值的 return
+            self.emit("ret", ret_place, None, "_")
+        else:
+            # 无返回值的 return
+            self.emit("ret", "_", None, "_")
+        self._exit("return语句")
+
+    # parse_S 的分派表：种类编号 -> 对应语句的解析方法
+    _S_DISPATCH = _table_by_kind({
+        ("DELIMITER", ";"): _parse_empty_stmt,
+        ("DELIMITER", "{"): _parse_block_stmt,
+        ("KEYWORD", "if"): _parse_if,
+        ("KEYWORD", "while"): _parse_while,
+        ("KEYWORD", "for"): _parse_for,
+        ("KEYWORD", "do"): _parse_do,
+        ("KEYWORD", "break"): _parse_break,
+        ("KEYWORD", "continue"): _parse_continue,
+        ("KEYWORD", "return"): _parse_return,
+    })
+
     # ForInit → id = B | D | ε 初始化条件
     def parse_ForInit(self):
-        if self.current_token.type == "IDENTIFIER":
-            lhs_name = self.current_token.value
-            self.match("IDENTIFIER")
-            self.match("OPERATOR", "=")
+        tok = self.current_token
+        if tok.type == "IDENTIFIER":
+            lhs_name = tok.value
+            self.match_type("IDENTIFIER")
+            self.match_exact("OPERATOR", "=")
             # 解析右侧布尔/算术表达式
-            _, _, rhs_place = self.parse_E()
+            _, _, rhs_place = self.parse_expr(ARITH_PREC)
             # 生成初始化赋值
             self.emit("=", rhs_place, None, lhs_name)
-        elif is_type(self.current_token.type, self.current_token.value):
+        elif self._kinds[self.pos] in TYPE_KINDS:
             # 只有声明初始化，这里只消费 type + id 列表，不要吃分号
             var_type = self.parse_type()
             self.parse_IDList(var_type, False)
@@ -967,19 +1179,22 @@ class SyntaxAnalyzer:
 
     def parse_ForIter(self):
         """ForIter → id CompAssign B | Prefix id | id Postfix | ε"""
+        ct = self.current_token
+        tt, tv = ct.type, ct.value
+        # 下一个 token 的类型和值，直接按下标读
+        nxt = self.pos + 1
+        nt, nv = self._types[nxt], self._values[nxt]
         # 1) 赋值迭代：id CompAssign B
-        if (self.current_token
-                and self.current_token.type == "IDENTIFIER"
-                and self.peek_n()
-                and self.peek_n().type == "OPERATOR"
-                and self.peek_n().value in {"=", "+=", "-=", "*=", "/=", "%="}):
+        if (tt == "IDENTIFIER"
+                and nt == "OPERATOR"
+                and nv in COMP_ASSIGN_OPS):
             self._enter("赋值迭代")
-            var = self.current_token.value
-            self.match("IDENTIFIER")
+            var = tv
+            self.match_type("IDENTIFIER")
             op = self.current_token.value  # e.g. "+="
-            self.match("OPERATOR", op)
+            self.match_exact("OPERATOR", op)
             # 解析右侧表达式
-            _, _, rhs_place = self.parse_E()
+            _, _, rhs_place = self.parse_expr(ARITH_PREC)
             if op == "=":
                 self.emit("=", rhs_place, None, var)
             else:
@@ -991,22 +1206,18 @@ class SyntaxAnalyzer:
             self._exit("赋值迭代")
             return
         # 2) 前缀 ++i / --i
-        elif (self.current_token
-              and self.current_token.type == "OPERATOR"
-              and self.current_token.value in ("++", "--")):
+        elif tt == "OPERATOR" and tv in INC_DEC_OPS:
             self._enter("前缀迭代")
-            self.match("OPERATOR", self.current_token.value)
-            self.match("IDENTIFIER")
+            self.match_exact("OPERATOR", tv)
+            self.match_type("IDENTIFIER")
             self._exit("前缀迭代")
         # 3) 后缀 i++ / i--
-        elif (self.current_token
-              and self.current_token.type == "IDENTIFIER"
-              and self.peek_n()
-              and self.peek_n().type == "OPERATOR"
-              and self.peek_n().value in ("++", "--")):
+        elif (tt == "IDENTIFIER"
+              and nt == "OPERATOR"
+              and nv in INC_DEC_OPS):
             self._enter("后缀迭代")
-            self.match("IDENTIFIER")
-            self.match("OPERATOR", self.current_token.value)  # ++ or --
+            self.match_type("IDENTIFIER")
+            self.match_exact("OPERATOR", self.current_token.value)  # ++ or --
             self._exit("后缀迭代")
         # 4) ε：什么也不做
         else:
@@ -1014,10 +1225,8 @@ class SyntaxAnalyzer:
 
     # ReturnExpr → B | ε              // 可选返回值
     def parse_ReturnExpr(self):
-        if (self.current_token and
-                (self.current_token.value == "!"
-                 or self.current_token.value == "("
-                 or self.current_token.type in ("IDENTIFIER", "LITERAL"))):
+        ct = self.current_token
+        if ct.value in RETURN_START_VALUES or ct.type in FACTOR_TYPES:
             self.parse_B()
 
     # D → ConstOpt type IDList ;
@@ -1028,14 +1237,14 @@ class SyntaxAnalyzer:
         var_type = self.parse_type()  # ← 把类型记下来
         # 把 const 信息也传下去
         self.parse_IDList(var_type, is_const)
-        self.match("DELIMITER", ";")
+        self.match_exact("DELIMITER", ";")
         self._exit("声明语句")
 
     # 处理类型
     def parse_type(self) -> str:
-        if is_type(self.current_token.type, self.current_token.value):
+        if self._kinds[self.pos] in TYPE_KINDS:
             t = self.current_token.value
-            self.match("KEYWORD")  # 吃掉 type
+            self.match_type("KEYWORD")  # 吃掉 type
             return t
         else:
             self.error("Expected type keyword", use_token=self.current_token)
@@ -1046,14 +1255,10 @@ class SyntaxAnalyzer:
         # 第一个变量名称
         var_name = self.current_token.value
         line = self.current_token.line
-        # 语义动作：检查同意作用域变量重定义
-        if not self.check_var_redefine(var_name=var_name, var_type=var_type, line=line):
-            # 类型有效性（一般不必，因为类型是从 KEYWORD 来的）
-            self.symtab.add_variable(var_name, var_type,
-                                     kind='CONST' if is_const else "variable",
-                                     line=line, init_value=None)
-
-        self.match("IDENTIFIER")
+        # 语义动作：检查同意作用域变量重定义，未重定义则登记
+        self.declare_variable(var_name, var_type, line, is_const)
+
+        self.match_type("IDENTIFIER")
         # 传入 var_name 和 var_type
         init_val = self.parse_IDInit(var_name, var_type)
         # 获取元素初始化值
@@ -1069,20 +1274,20 @@ class SyntaxAnalyzer:
     def parse_IDInit(self, var_name: str, var_type: str) -> Optional[Union[int, float, bool, str]]:
         """
             IDInit → = E | ε
-            对声明初始化使用算术表达式 parse_E 返回 (typ, const_val, place)
+            对声明初始化只解析算术表达式，parse_expr(ARITH_PREC) 返回 (typ, const_val, place)
         """
-        if self.current_token and self.current_token.value == "=":
+        if self.current_token.value == "=":
             self._enter("初始化")
-            self.match("OPERATOR", "=")
+            self.match_exact("OPERATOR", "=")
 
-            # ←—— 这里改成 parse_E 而不是 parse_B ——→
-            rhs_type, rhs_val, rhs_place = self.parse_E()
+            # ←—— 只解析算术部分，不走布尔表达式 ——→
+            rhs_type, rhs_val, rhs_place = self.parse_expr(ARITH_PREC)
 
             # 检查类型兼容性
             if not self.type_compatible(var_type, rhs_type):
                 self.report_error(
-                    f"[Semantic Error] Cannot initialize '{var_name}' of type '{var_type}' "
-                    f"with '{rhs_type}' at line {self.current_token.line}"
+                    "[Semantic Error] Cannot initialize '{}' of type '{}' with '{}' at line {}",
+                    var_name, var_type, rhs_type, self.current_token.line
                 )
 
             # 如果得到编译期常量，写回 sym.value
@@ -1100,18 +1305,17 @@ class SyntaxAnalyzer:
 
     # IDList' → , id IDInit IDList' | ε
     def parse_IDListTail(self, var_type, is_const=False):
-        while self.current_token and self.current_token.type == "DELIMITER" and self.current_token.value == ",":
+        while self._kinds[self.pos] == K_COMMA:
             self._enter("继续声明")
-            self.match("DELIMITER", ",")
+            self.match_exact("DELIMITER", ",")
             # 添加后续变量
-            vname = self.current_token.value
-            line = self.current_token.line
-            # 进行重定义检查
-            if not self.check_var_redefine(vname, var_type, line):
-                self.symtab.add_variable(vname, var_type, kind='CONST' if is_const else "variable",
-                                         line=line, init_value=None)
-
-            self.match("IDENTIFIER")
+            tok = self.current_token
+            vname = tok.value
+            line = tok.line
+            # 进行重定义检查，未重定义则登记
+            self.declare_variable(vname, var_type, line, is_const)
+
+            self.match_type("IDENTIFIER")
             # ① 先解析初始化表达式，拿到可能的常量值
             init_val = self.parse_IDInit(vname, var_type)
             # ② 如果真的得到了一个编译期常量，就写回 symbol.value
@@ -1124,155 +1328,152 @@ class SyntaxAnalyzer:
     # S' → else S | ε
     def parse_S_prime(self):
         # 只有在下一个是 else 时才进入
-        if (self.current_token
-                and self.current_token.type == "KEYWORD"
-                and self.current_token.value == "else"):
+        if self._kinds[self.pos] == K_ELSE:
             self._enter("else分支")
-            self.match("KEYWORD", "else")
+            self.match_exact("KEYWORD", "else")
             self.parse_S()
             self._exit("else分支")
         # 否则什么都不做（ε）
 
-    # B → ( B ) B' | !B B' | R B'
+    # B → Expr（按布尔表达式使用）
     def parse_B(self) -> Tuple[str, List[int], List[int]]:
         """
         布尔表达式 Produces short-circuit jumps.
-        B → R { && R | || R }
-          | ! B
-        返回 ( 'bool', truelist, falselist )
+        返回 ( 'bool', truelist, falselist )；
+        没有关系/逻辑运算时按原样返回算术类型和空的跳转链
         """
-        # 一元 !
-        if self.current_token.type == "OPERATOR" and self.current_token.value == "!":
-            self.match("OPERATOR", "!")
-            _, tlist, flist = self.parse_B()
-            # 取反：swap
-            return "bool", flist, tlist
-
-        # 先解析关系表达式
-        _, truelist, falselist = self.parse_R()
-
-        # 再处理 &&、||
-        while (self.current_token and
-               self.current_token.type == "OPERATOR" and
-               self.current_token.value in ("&&", "||")):
-            op = self.current_token.value
-            self.match("OPERATOR", op)
-
-            if op == "&&":
-                # B1 && B2 ：B1.true 跳去 B2，false 列表保留
-                self.backpatch(truelist, self.next_quad())
-                _, t2, f2 = self.parse_B()
-                truelist = t2
-                falselist = self.merge(falselist, f2)
-
-            else:  # op == "||"
-                # B1 || B2 ：B1.false 跳去 B2，true 列表保留
-                self.backpatch(falselist, self.next_quad())
-                _, t2, f2 = self.parse_B()
-                truelist = self.merge(truelist, t2)
-                falselist = f2
-
-        return "bool", truelist, falselist
-
-    # R → E R'
-    # R' → relop E R' | ε
-    def parse_R(self) -> Tuple[str, List[int], List[int]]:
+        return self._bool_operand(1)
+
+    # Expr → F { binop Expr } ，按 BINARY_PREC 做优先级爬升
+    def parse_expr(self, min_prec: int = 1):
         """
-        关系表达式 → E [ relop E ]*
-        返回 ( 'bool', truelist, falselist )
+        以 F 为原子的优先级爬升，合并了原来的 B / R / E / T 四层递归。
+        只出现算术运算时返回 (type, 常量值, place)；
+        出现关系或逻辑运算后返回 ('bool', truelist, falselist)。
+        min_prec = ARITH_PREC 时只解析算术表达式，遇到关系/逻辑运算符即停止。
         """
-        lt, lv, lp = self.parse_E()
-        # 一开始没有任何跳转
-        truelist, falselist = [], []
-        # 如果没有遇到任何 relop，就把它当作算术表达式，不产生命令
-        if not (self.current_token and
-                self.current_token.type == "OPERATOR" and
-                self.current_token.value in (">", "<", ">=", "<=", "==", "!=")):
-            return lt, [], []
-        # 否则至少一次关系运算
-        while (self.current_token and
-               self.current_token.type == "OPERATOR" and
-               self.current_token.value in (">", "<", ">=", "<=", "==", "!=")):
-            op = self.current_token.value
-            self.match("OPERATOR", op)
-            rt, rv, rp = self.parse_E()
-            # 生成 if-true 跳转，target 待回填
-            idx_true = self.emit(f"j{op}", lp, rp, None)
-            # 生成 if-false 跳转，target 待回填
-            idx_false = self.emit("j", None, None, None)
-            # 把 lp 更新为下一个比较左值,因为后续可能有其它表达式
-            lp = rp
-            # 收集 list
-            truelist = self.merge(truelist, self.makelist(idx_true))
-            falselist = self.merge(falselist, self.makelist(idx_false))
-        return "bool", truelist, falselist
-
-    # E → T E'
-    # E' → + T E' | - T E' | ε
-    def parse_E(self) -> Tuple[str, Optional[Union[int, float]], str]:
-        self._enter("算术表达式")
-        # 解析第一个项
-        lt, lv, lp = self.parse_T()
-        while (self.current_token
-               and self.current_token.type == "OPERATOR"
-               and self.current_token.value in ("+", "-")):
-            op = self.current_token.value
-            self.match("OPERATOR", op)
-            # 解析右侧表达式的类型、值与跳转位置
-            rt, rv, rp = self.parse_T()
-            tt = 'float' if 'float' in (lt, rt) else 'int'
-            # 如果左右两边都能在编译期算出常量值，则直接计算常量，常量折叠
-            if lv is not None and rv is not None:
-                lv = lv + rv if op == "+" else lv - rv
-                lp = str(lv)
-            else:
-                # 否则无法在编译期确定结果，需要生成临时变量名和四元式
-                lv = None
-                tmp = self.new_temp()
-                self.emit(op, lp, rp, tmp)
-                lp = tmp
-            # 更新当前表达式的类型为新的类型
-            lt = tt
-        self._exit("算术表达式")
-        # 返回表达式的类型 lt, 可能的常量值 lv, 和结果位置 lp
-        return lt, lv, lp
+        self._enter("表达式")
+        tok = self.current_token
+        # 一元 !：作用于紧随其后的关系表达式，取反即交换真假链
+        if min_prec <= REL_PREC and tok.type == "OPERATOR" and tok.value == "!":
+            self.match_exact("OPERATOR", "!")
+            _, tlist, flist = self._bool_operand(REL_PREC)
+            lt, lv, lp = "bool", flist, tlist
+        else:
+            # 处于布尔上下文时，括号内允许完整的布尔表达式，如 (a > 0 && b > 0)
+            lt, lv, lp = self.parse_F(1 if min_prec <= REL_PREC else ARITH_PREC)
+        # 关系运算连写时（a < b < c），下一次比较的左值是上一次的右值
+        rel_place = None
+        # 循环内反复用到的属性与方法先绑定为局部变量
+        prec_of = BINARY_PREC.get
+        tokens, types, values = self._tokens, self._types, self._values
+
+        while True:
+            # 直接按列取当前 token 的类型和值，不经过 Token 对象
+            pos = self.pos
+            if types[pos] != "OPERATOR":
+                break
+            op = values[pos]
+            prec = prec_of(op)
+            if prec is None or prec < min_prec:
+                break
+            # 运算符已确认匹配，直接前移，不再走 match_exact 的重复检查
+            self.last_token = self.current_token
+            self.pos = pos + 1
+            self.current_token = tokens[pos + 1]
+
+            if op in LOGIC_OPS:
+                truelist, falselist = (lv, lp) if lt == "bool" else ([], [])
+                if op == "&&":
+                    # B1 && B2 ：B1.true 跳去 B2，false 列表保留
+                    self.backpatch(truelist, self.next_quad())
+                    _, t2, f2 = self._bool_operand(prec + 1)
+                    truelist = t2
+                    falselist = self.merge(falselist, f2)
+                else:  # op == "||"
+                    # B1 || B2 ：B1.false 跳去 B2，true 列表保留
+                    self.backpatch(falselist, self.next_quad())
+                    _, t2, f2 = self._bool_operand(prec + 1)
+                    truelist = self.merge(truelist, t2)
+                    falselist = f2
+                lt, lv, lp = "bool", truelist, falselist
+                rel_place = None
+
+            elif op in REL_OPS:
+                if lt == "bool":
+                    if rel_place is None:
+                        # 左边是 && / || 或括号里的布尔表达式，没有可比较的值
+                        self.report_error(
+                            "[Semantic Error] Cannot compare a boolean expression at line {}", self.last_token.line
+                        )
+                    left, truelist, falselist = rel_place, lv, lp
+                else:
+                    left, truelist, falselist = lp, [], []
+                rt, rv, rp = self.parse_expr(prec + 1)
+                if (lt != "bool" and isinstance(lv, (int, float))
+                        and isinstance(rv, (int, float))):
+                    # 两边都是常量，结果已知：只生成一条无条件跳转，挂到对应的链上
+                    idx = self.emit("j", None, None, None)
+                    if REL_EVAL[op](lv, rv):
+                        truelist = self.merge(truelist, self.makelist(idx))
+                    else:
+                        falselist = self.merge(falselist, self.makelist(idx))
+                else:
+                    # 生成 if-true 跳转，target 待回填
+                    idx_true = self.emit(f"j{op}", left, rp, None)
+                    # 生成 if-false 跳转，target 待回填
+                    idx_false = self.emit("j", None, None, None)
+                    truelist = self.merge(truelist, self.makelist(idx_true))
+                    falselist = self.merge(falselist, self.makelist(idx_false))
+                lt, lv, lp = "bool", truelist, falselist
+                rel_place = rp
 
-    # T → F T'
-    # T' → * F T' | / F' | ε
-    # T → F T'
-    def parse_T(self) -> Tuple[str, Optional[Union[int, float]], str]:
-        self._enter("项")
-        lt, lv, lp = self.parse_F()
-        while (self.current_token
-               and self.current_token.type == "OPERATOR"
-               and self.current_token.value in ("*", "/", "%")):
-            op = self.current_token.value
-            self.match("OPERATOR", op)
-            rt, rv, rp = self.parse_F()
-            tt = 'float' if 'float' in (lt, rt) else 'int'
-            if op in ("/", "%") and rv == 0:
-                self.report_error(
-                    f"[Semantic Error] Division or modulo by zero at line {self.last_token.line}"
-                )
-                lv = None
-            elif lv is not None> 0 and rv is not None:
-                if isinstance(lv, (int, float)) and isinstance(rv, (int, float)):  # 确保 lv 和 rv 是数值
-                    if op == "*":
+            else:
+                # 算术运算：+ - * / %
+                rt, rv, rp = self.parse_expr(prec + 1)
+                tt = 'float' if lt == 'float' or rt == 'float' else 'int'
+                if op in DIV_OPS and rv == 0:
+                    self.report_error(
+                        "[Semantic Error] Division or modulo by zero at line {}", self.last_token.line
+                    )
+                    lv = None
+                elif isinstance(lv, (int, float)) and isinstance(rv, (int, float)):
+                    # 左右两边都是编译期数值常量，常量折叠
+                    if op == "+":
+                        lv = lv + rv
+                    elif op == "-":
+                        lv = lv - rv
+                    elif op == "*":
                         lv = lv * rv
+                    elif tt == 'int':
+                        # 按 C 语义：整数除法向零截断，余数与被除数同号
+                        q = abs(lv) // abs(rv)
+                        if (lv < 0) != (rv < 0):
+                            q = -q
+                        lv = q if op == "/" else lv - rv * q
                     elif op == "/":
                         lv = lv / rv
                     else:
-                        lv = lv % rv
+                        lv = math.fmod(lv, rv)
                     lp = str(lv)
-            else:
-                lv = None
-                tmp = self.new_temp()
-                self.emit(op, lp, rp, tmp)
-                lp = tmp
-            lt = tt
-        self._exit("项")
+                else:
+                    # 否则无法在编译期确定结果，需要生成临时变量名和四元式
+                    lv = None
+                    tmp = self.new_temp()
+                    self.emit(op, lp, rp, tmp)
+                    lp = tmp
+                lt = tt
+
+        self._exit("表达式")
         return lt, lv, lp
 
+    # 按布尔值解析一个操作数：算术结果按空跳转链处理
+    def _bool_operand(self, min_prec: int) -> Tuple[str, List[int], List[int]]:
+        t, a, b = self.parse_expr(min_prec)
+        if t != "bool":
+            return t, [], []
+        return t, a, b
+
     """
     F   → id ( ArgListOpt ) ;
     | ( R ) 
@@ -1283,66 +1484,46 @@ class SyntaxAnalyzer:
     Prefix  → ++ | -- | + | - 
     """
 
-    def parse_F(self) -> Tuple[str, Optional[Union[int, float]], str]:
+    def parse_F(self, paren_prec: int = ARITH_PREC) -> Tuple[str, Optional[Union[int, float]], str]:
         self._enter("因子")
         tok = self.current_token
-
-        # 前缀 +/-
-        if tok.type == "OPERATOR" and tok.value in ("+", "-"):
-            op = tok.value
-            self.match("OPERATOR", op)
-            t, v, p = self.parse_F()
-            if v is not None:
-                v = +v if op == "+" else -v
-                p = str(v)
-            else:
+        tt, tv = tok.type, tok.value
+
+        # 按 token 类型分派，出现最多的标识符与字面量放在前面
+        if tt == "IDENTIFIER":
+            # 函数调用
+            if self._values[self.pos + 1] == "(":
+                name = tv
+                self.match_type("IDENTIFIER")
+                self.match_exact("OPERATOR", "(")
+                # 收集所有实参的 place
+                arg_places = self.parse_ArgListOpt()
+                self.match_exact("OPERATOR", ")")
+                sym = self.symtab.lookup_function(name)
+                t = sym.type if sym else 'int'
+                if not sym:
+                    self.report_error("[Semantic] call to undeclared function '{}' at line {}", name, tok.line)
+
+                # ② 为每个实参生成 param 四元式
+                for p in arg_places:
+                    self.emit("para", p, None, "_")
+                # ③ 生成 call 四元式，res 存放返回值临时变量
                 tmp = self.new_temp()
-                self.emit(op, p, None, tmp)
-                p = tmp
-            self._exit("因子")
-            return t, v, p
-
-        # 函数调用
-        if tok.type == "IDENTIFIER" and self.peek_n().value == "(":
-            name = tok.value
-            self.match("IDENTIFIER")
-            self.match("OPERATOR", "(")
-            # 收集所有实参的 place
-            arg_places = self.parse_ArgListOpt()
-            self.match("OPERATOR", ")")
-            sym = self.symtab.lookup_function(name)
-            t = sym.type if sym else 'int'
-            if not sym:
-                self.report_error(f"[Semantic] call to undeclared function '{name}' at line {tok.line}")
-
-            # ② 为每个实参生成 param 四元式
-            for p in arg_places:
-                self.emit("para", p, None, "_")
-            # ③ 生成 call 四元式，res 存放返回值临时变量
-            tmp = self.new_temp()
-            self.emit("call", name, str(len(arg_places)), tmp)
-
-            self._exit("因子")
-            return t, None, tmp
+                self.emit("call", name, str(len(arg_places)), tmp)
 
-        # 括号表达式
-        if tok.type == "OPERATOR" and tok.value == "(":
-            self.match("OPERATOR", "(")
-            t, v, p = self.parse_E()
-            self.match("OPERATOR", ")")
-            self._exit("因子")
-            return t, v, p
+                self._exit("因子")
+                return t, None, tmp
 
-        # 标识符
-        if tok.type == "IDENTIFIER":
-            name = tok.value
-            self.match("IDENTIFIER")
+            # 标识符
+            name = tv
+            self.match_type("IDENTIFIER")
             sym = self.symtab.lookup_variable(name)
-            if not sym:
-                self.report_error(f"[Semantic Error] Use of undeclared variable '{name}' at line {tok.line}")
+            if sym is None:
+                self.report_error("[Semantic Error] Use of undeclared variable '{}' at line {}", name, tok.line)
                 t, v = 'int', None
             else:
-                sym.increment()
+                # 每个变量引用都会走到这里，直接累加引用计数，省一次方法调用
+                sym.count += 1
                 t = sym.type
                 # 只有真正的 const 才算编译期常量
                 if sym.kind == 'CONST':
@@ -1350,29 +1531,47 @@ class SyntaxAnalyzer:
                 else:
                     v = None
 
-            # 后缀++ --
-            if self.current_token and self.current_token.type == "OPERATOR" and self.current_token.value in (
-                    "++", "--"):
-                self.match("OPERATOR", self.current_token.value)
+            # 后缀++ --：绝大多数标识符后面没有，先用值列做一次集合判断就能跳过
+            if self._values[self.pos] in INC_DEC_OPS and self._types[self.pos] == "OPERATOR":
+                self.match_exact("OPERATOR", self._values[self.pos])
                 v = None
             self._exit("因子")
             return t, v, name
 
         # 字面量
-        if tok.type == "LITERAL":
-            lit = tok.value
-            self.match("LITERAL")
-            if '.' in lit or 'e' in lit.lower():
-                t, v = 'float', float(lit)
-            elif lit in ('true', 'false'):
-                t, v = 'bool', (lit == 'true')
-            elif lit.startswith("'") and lit.endswith("'"):
-                t, v = 'char', lit[1]
-            else:
-                t, v = 'int', int(lit)
+        if tt == "LITERAL":
+            self.match_type("LITERAL")
+            const = self._lit_cache.get(tv)
+            if const is None:
+                const = self._lit_cache[tv] = literal_const(tv)
+            t, v = const
             self._exit("因子")
             return t, v, str(v)
 
+        if tt == "OPERATOR":
+            # 前缀 +/-
+            if tv in ADD_OPS:
+                op = tv
+                self.match_exact("OPERATOR", op)
+                t, v, p = self.parse_F()
+                if v is not None:
+                    v = +v if op == "+" else -v
+                    p = str(v)
+                else:
+                    tmp = self.new_temp()
+                    self.emit(op, p, None, tmp)
+                    p = tmp
+                self._exit("因子")
+                return t, v, p
+
+            # 括号表达式：括号内按调用方给的优先级解析，算术上下文中仍只收算术表达式
+            if tv == "(":
+                self.match_exact("OPERATOR", "(")
+                t, v, p = self.parse_expr(paren_prec)
+                self.match_exact("OPERATOR", ")")
+                self._exit("因子")
+                return t, v, p
+
         self.error("Expected factor")
         self._exit("因子")
         return 'int', None, "-"
@@ -1382,11 +1581,8 @@ class SyntaxAnalyzer:
     def parse_ArgListOpt(self) -> List[str]:
         # 如果下一个是表达式的起始符，就去解析实参列表
 
-        if self.current_token and (
-                self.current_token.value in ("!", "++", "--")
-                or self.current_token.value == "("
-                or self.current_token.type in ("IDENTIFIER", "LITERAL")
-        ):
+        ct = self.current_token
+        if ct.value in ARG_START_VALUES or ct.type in FACTOR_TYPES:
             return self.parse_ArgList()
 
         return []
@@ -1396,25 +1592,17 @@ class SyntaxAnalyzer:
     def parse_ArgList(self) -> List[str]:
         args: List[str] = []
         # 解析第一个实参为算术／通用表达式
-        _, _, place = self.parse_E()
+        _, _, place = self.parse_expr(ARITH_PREC)
         args.append(place)
         # 解析后续逗号分隔的实参
-        while self.current_token and self.current_token.type == "DELIMITER" and self.current_token.value == ",":
-            self.match("DELIMITER", ",")
-            _, _, place = self.parse_E()
+        while self._kinds[self.pos] == K_COMMA:
+            self.match_exact("DELIMITER", ",")
+            _, _, place = self.parse_expr(ARITH_PREC)
             args.append(place)
         return args
 
-    # ArgList’ → , B ArgList’ | ε
-    def parse_ArgList_tail(self):
-        while (self.current_token.type == "DELIMITER" and
-               self.current_token.value == ","):
-            self.match("DELIMITER", ",")
-            self.parse_B()
-        # 为空不处理
-
 
 # ----- 主程序入口 -----
 if __name__ == "__main__":
-    parser = SyntaxAnalyzer("./token/tokens.txt")
+    parser = SyntaxAnalyzer("./token/tokens.txt", trace=True)
     parser.parse()
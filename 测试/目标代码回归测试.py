@@ -0,0 +1,354 @@
+"""
+目标代码回归测试：比较优化前后生成的汇编在运行时的行为是否一致。
+
+对 测试/语法分析测试用例 下的每个样例（外加一个调用密集的压力程序）：
+  1. 用当前的词法、语法分析器生成 quads.txt / symbol_table.json；
+  2. 分别用当前的 objectCodeGenerator 和基准版本（默认为仓库第一个提交，可用 --base 指定）生成汇编；
+  3. 在下面的 8086 子集模拟器中运行两份汇编，比较 write 输出序列与结束状态。
+另外检查每份汇编中引用到的 ds:[_x] 是否都在数据段中声明。
+
+用法（在仓库任意目录下）：
+    python 测试/目标代码回归测试.py [--base <git 版本>] [-v]
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from non_auto_lexical_analyzer import Lexer  # noqa: E402
+from syntax_analyzer import SyntaxAnalyzer  # noqa: E402
+import objectCodeGenerator  # noqa: E402
+
+# read 依次读到的输入，用完后一直返回 0
+READ_INPUTS = [10, 3, 7, 2, 5, 1, 8, 4, 6, 9]
+# 单个程序最多执行的指令数，超出视为死循环
+MAX_STEPS = 200000
+
+# 调用密集的压力程序：递归、多参数调用、调用结果参与表达式。
+# 乘除的操作数都用变量：生成器把立即数乘数当成内存变量处理（基准版本即如此），用常量会让结果恒为 0
+STRESS_PROGRAM = """
+int add(int a, int b)
+{
+    return a + b;
+}
+int mul3(int a, int b, int c)
+{
+    int t;
+    t = a * b;
+    return t * c;
+}
+int fib(int n)
+{
+    if (n < 2)
+    {
+        return n;
+    }
+    return fib(n - 1) + fib(n - 2);
+}
+void main()
+{
+    int i;
+    int s;
+    int two;
+    int three;
+    s = 0;
+    two = 2;
+    three = 3;
+    for (i = 0; i < 8; i = i + 1)
+    {
+        s = s + add(i, fib(i)) * two - mul3(i, two, three) / three;
+        write(s);
+        // 临时变量的活跃区间跨过函数调用
+        s = s + (i * three) + mul3(i, two, three) + (i * two) * fib(three);
+        write(s);
+    }
+    write(add(add(1, 2), add(3, mul3(1, two, three))));
+}
+"""
+
+MASK = 0xFFFF
+COND_JUMPS = {
+    'jl': lambda a, b: a < b, 'jle': lambda a, b: a <= b,
+    'jg': lambda a, b: a > b, 'jge': lambda a, b: a >= b,
+    'je': lambda a, b: a == b, 'jne': lambda a, b: a != b,
+}
+# 库过程会改写的寄存器，模拟时置为垃圾值，以暴露跨调用存活的寄存器变量
+CLOBBERED = ('bx', 'cx', 'dx', 'si', 'di')
+
+
+def signed(v):
+    return v - 0x10000 if v & 0x8000 else v
+
+
+class SimError(Exception):
+    pass
+
+
+class Sim8086:
+    """只覆盖本编译器生成的指令子集；_read / _write 直接拦截，不执行库代码。"""
+
+    def __init__(self, asm_text, inputs):
+        self.code = []
+        self.labels = {}
+        self.declared = set()
+        in_code = False
+        for raw in asm_text.splitlines():
+            line = raw.split(';', 1)[0].strip()
+            if not line:
+                continue
+            if line == 'code segment':
+                in_code = True
+                continue
+            if not in_code:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1] == 'dw':
+                    self.declared.add(parts[0])
+                continue
+            if line.endswith(':'):
+                self.labels[line[:-1]] = len(self.code)
+                continue
+            op, _, rest = line.partition(' ')
+            args = [a.strip() for a in rest.split(',')] if rest.strip() else []
+            self.code.append((op, args))
+        self.regs = dict.fromkeys(('ax', 'bx', 'cx', 'dx', 'si', 'di', 'sp', 'bp'), 0)
+        self.data = {}
+        self.stack = {}
+        self.flags = (0, 0)
+        self.inputs = list(inputs)
+        self.output = []
+        self.undeclared = set()
+
+    # ---- 操作数读写 ----
+    def _mem(self, arg):
+        """返回 (空间, 地址)；不是内存操作数时返回 None"""
+        if '[' not in arg:
+            return None
+        inner = arg[arg.index('[') + 1:arg.index(']')]
+        if inner.startswith('_'):
+            if inner not in self.declared:
+                self.undeclared.add(inner)
+            return self.data, inner
+        if inner.startswith('bp'):
+            off = int(inner[2:] or 0)
+            return self.stack, (self.regs['bp'] + off) & MASK
+        raise SimError(f'unsupported memory operand {arg}')
+
+    def read(self, arg):
+        mem = self._mem(arg)
+        if mem is not None:
+            space, addr = mem
+            return space.get(addr, 0)
+        if arg in self.regs:
+            return self.regs[arg]
+        if arg.lstrip('-').isdigit():
+            return int(arg) & MASK
+        if arg.endswith('h') and arg[:-1].isalnum():
+            return int(arg[:-1], 16) & MASK
+        # 段名等符号常量（data / stack / extended）
+        return 0
+
+    def write(self, arg, value):
+        value &= MASK
+        mem = self._mem(arg)
+        if mem is not None:
+            space, addr = mem
+            space[addr] = value
+        elif arg in self.regs:
+            self.regs[arg] = value
+        elif arg == 'ah':
+            self.regs['ax'] = (self.regs['ax'] & 0xFF) | ((value & 0xFF) << 8)
+        elif arg in ('es', 'ss', 'ds'):
+            pass
+        else:
+            raise SimError(f'cannot write operand {arg}')
+
+    def jump(self, label):
+        if label not in self.labels:
+            raise SimError(f'jump to undefined label {label}')
+        return self.labels[label]
+
+    def push(self, value):
+        self.regs['sp'] = (self.regs['sp'] - 2) & MASK
+        self.stack[self.regs['sp']] = value & MASK
+
+    def pop(self):
+        value = self.stack.get(self.regs['sp'], 0)
+        self.regs['sp'] = (self.regs['sp'] + 2) & MASK
+        return value
+
+    # ---- 执行 ----
+    def run(self):
+        if 'start' not in self.labels:
+            raise SimError('no start label')
+        pc = self.labels['start']
+        regs = self.regs
+        for _ in range(MAX_STEPS):
+            if pc >= len(self.code):
+                raise SimError('fell off the end of the code segment')
+            op, args = self.code[pc]
+            pc += 1
+            if op == 'mov':
+                self.write(args[0], self.read(args[1]))
+            elif op == 'add':
+                self.write(args[0], self.read(args[0]) + self.read(args[1]))
+            elif op == 'sub':
+                self.write(args[0], self.read(args[0]) - self.read(args[1]))
+            elif op == 'imul':
+                prod = signed(regs['ax']) * signed(self.read(args[0]))
+                regs['ax'], regs['dx'] = prod & MASK, (prod >> 16) & MASK
+            elif op == 'cwd':
+                regs['dx'] = MASK if regs['ax'] & 0x8000 else 0
+            elif op == 'idiv':
+                divisor = signed(self.read(args[0]))
+                if divisor == 0:
+                    raise SimError('division by zero')
+                dividend = (regs['dx'] << 16) | regs['ax']
+                if dividend & 0x80000000:
+                    dividend -= 1 << 32
+                q = abs(dividend) // abs(divisor)
+                if (dividend < 0) != (divisor < 0):
+                    q = -q
+                regs['ax'], regs['dx'] = q & MASK, (dividend - q * divisor) & MASK
+            elif op == 'cmp':
+                self.flags = (signed(self.read(args[0])), signed(self.read(args[1])))
+            elif op == 'jmp':
+                pc = self.jump(args[0].split()[-1])
+            elif op in COND_JUMPS:
+                if COND_JUMPS[op](*self.flags):
+                    pc = self.jump(args[0])
+            elif op == 'push':
+                self.push(self.read(args[0]))
+            elif op == 'pop':
+                self.write(args[0], self.pop())
+            elif op == 'call':
+                target = args[0]
+                if target == '_read':
+                    regs['ax'] = self.inputs.pop(0) if self.inputs else 0
+                    regs.update(dict.fromkeys(CLOBBERED, 0xDEAD))
+                elif target == '_write':
+                    self.output.append(self.stack.get(regs['sp'], 0))
+                    regs['sp'] = (regs['sp'] + 2) & MASK  # _write 以 ret 2 返回
+                    regs.update(dict.fromkeys(CLOBBERED, 0xDEAD))
+                    regs['ax'] = 0xDEAD
+                else:
+                    self.push(pc)
+                    pc = self.jump(target)
+            elif op == 'ret':
+                pc = self.pop()
+                if args:
+                    regs['sp'] = (regs['sp'] + int(args[0])) & MASK
+            elif op == 'int':
+                if regs['ax'] >> 8 == 0x4C:
+                    return
+                raise SimError(f'unsupported interrupt, ah={regs["ax"] >> 8:#x}')
+            else:
+                raise SimError(f'unsupported instruction {op}')
+        raise SimError('step limit exceeded')
+
+
+def load_generator(rev):
+    """从 git 中取出指定版本的 objectCodeGenerator 作为模块加载"""
+    src = subprocess.run(['git', 'show', f'{rev}:objectCodeGenerator.py'], cwd=ROOT,
+                         capture_output=True, text=True, encoding='utf-8', check=True).stdout
+    module = types.ModuleType(f'objectCodeGenerator_{rev}')
+    exec(compile(src, f'{rev}:objectCodeGenerator.py', 'exec'), module.__dict__)
+    return module
+
+
+def gen_asm(module):
+    quads = module.process_quads()
+    gen = module.TargetCodeGenerator()
+    gen.generate(quads)
+    gen.save_to_file()
+    with open('./output/object_code.asm', encoding='utf-8') as f:
+        return f.read()
+
+
+def run_asm(asm):
+    """返回 (结束状态, 输出序列, 未声明的变量)"""
+    sim = Sim8086(asm, READ_INPUTS)
+    try:
+        sim.run()
+        status = 'ok'
+    except SimError as e:
+        status = f'error: {e}'
+    return status, sim.output, sorted(sim.undeclared)
+
+
+def check_case(name, code, base_module, verbose):
+    workdir = tempfile.mkdtemp(prefix='cg_regress_')
+    os.makedirs(os.path.join(workdir, 'output'))
+    os.makedirs(os.path.join(workdir, 'token'))
+    tokens, _ = Lexer().tokenize(code)
+    with open(os.path.join(workdir, 'token', 'tokens.txt'), 'w', encoding='gbk', errors='replace') as f:
+        for t in tokens:
+            f.write(f"{t.line}:{t.column}\t{t.token_type.category.value}\t{t.lexeme}\n")
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                SyntaxAnalyzer().parse()
+        except Exception as e:  # 语法分析本身失败的样例不参与比较
+            return 'skip', f'parser raised {type(e).__name__}: {e}'
+        results = []
+        for module in (base_module, objectCodeGenerator):
+            try:
+                results.append(run_asm(gen_asm(module)))
+            except Exception as e:
+                results.append((f'generator raised {type(e).__name__}: {e}', [], []))
+    finally:
+        os.chdir(cwd)
+
+    (base_status, base_out, base_undeclared), (new_status, new_out, new_undeclared) = results
+    if base_status == new_status == 'error: step limit exceeded':
+        # 两边都没跑完时，只比较都已经产生的那部分输出
+        n = min(len(base_out), len(new_out))
+        base_out, new_out = base_out[:n], new_out[:n]
+    problems = []
+    if (base_status, base_out) != (new_status, new_out):
+        problems.append(f'base {base_status} {base_out[:20]} != new {new_status} {new_out[:20]}')
+    # 基准版本本来就引用但未声明的变量（如字符常量）不算回归
+    extra = sorted(set(new_undeclared) - set(base_undeclared))
+    if extra:
+        problems.append(f'undeclared data: {extra}')
+    if problems:
+        return 'FAIL', '; '.join(problems)
+    return 'ok', f'{new_status} {new_out[:20]}' if verbose else ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--base', help='基准版本，默认为仓库第一个提交')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    opts = parser.parse_args()
+    base = opts.base or subprocess.run(['git', 'rev-list', '--max-parents=0', 'HEAD'], cwd=ROOT,
+                                       capture_output=True, text=True, check=True).stdout.split()[0]
+    base_module = load_generator(base)
+
+    cases = []
+    for path in sorted(glob.glob(os.path.join(ROOT, '测试', '语法分析测试用例', '*.txt'))):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            cases.append((os.path.basename(path), f.read()))
+    cases.append(('<stress>', STRESS_PROGRAM))
+
+    failed = 0
+    for name, code in cases:
+        status, detail = check_case(name, code, base_module, opts.verbose)
+        failed += status == 'FAIL'
+        print(f'{status:5} {name} {detail}'.rstrip())
+    print(f'{len(cases)} cases, {failed} failed (base {base[:8]})')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())